@@ -0,0 +1,88 @@
+"""
+Runs slow matrix operations and database calls off the Kivy main thread, handing their results back to it
+through Clock.schedule_once
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from kivy.clock import Clock
+
+
+class OperationCancelled(Exception):
+    """
+    Raised inside a task's work when it reports progress after being cancelled
+    """
+
+
+class BackgroundTask(object):
+    """
+    A unit of work submitted to a BackgroundWorker. The work receives its task and calls report_progress as
+    it advances, which is also where a cancelled task stops.
+    """
+
+    def __init__(self, on_progress=None):
+        self.cancelled = threading.Event()
+        self.on_progress = on_progress
+        self.reported_percent = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def report_progress(self, done, total):
+        """
+        Passes the progress to on_progress on the main thread whenever the whole percentage changes
+        :param done:
+        :param total:
+        :return:
+        """
+        if self.cancelled.is_set():
+            raise OperationCancelled()
+        percent = 100 * done // total if total else 100
+        if self.on_progress is not None and percent != self.reported_percent:
+            self.reported_percent = percent
+            Clock.schedule_once(lambda dt: self.on_progress(percent))
+
+
+class BackgroundWorker(object):
+    """
+    Runs tasks on a single worker thread, so they execute one at a time in the order they were submitted and
+    database sessions are never shared between threads
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='matrix-worker')
+
+    def submit(self, work, on_done, on_error, on_progress=None, on_cancelled=None):
+        """
+        Runs work(task) on the worker thread, then calls exactly one of the callbacks on the main thread
+        :param work:
+        :param on_done: Called with the return value of work
+        :param on_error: Called with the exception raised by work
+        :param on_progress: Called with the percentage of work done, whenever it changes
+        :param on_cancelled: Called if the task was cancelled before work finished
+        :return: The BackgroundTask, which can be cancelled
+        """
+        task = BackgroundTask(on_progress)
+
+        def run():
+            try:
+                result = work(task)
+                if task.cancelled.is_set():  # Cancelled after its last progress report
+                    raise OperationCancelled()
+            except OperationCancelled:
+                if on_cancelled is not None:
+                    Clock.schedule_once(lambda dt: on_cancelled())
+            except Exception as error:
+                Clock.schedule_once(lambda dt, error=error: on_error(error))
+            else:
+                Clock.schedule_once(lambda dt: on_done(result))
+
+        self.executor.submit(run)
+        return task
+
+    def shutdown(self):
+        """
+        Cancels any task that has not started and stops the worker thread once the running one finishes
+        :return:
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
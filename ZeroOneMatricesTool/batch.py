@@ -0,0 +1,130 @@
+"""
+Vectorized property operations over a stack of matrices held in a (batch, n, n) boolean NumPy array
+"""
+import numpy as np
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+
+
+def _check_batch(matrices):
+    matrices = np.asarray(matrices, dtype=bool)
+    if matrices.ndim != 3 or matrices.shape[1] != matrices.shape[2]:
+        raise ValueError(f'Expected a (batch, n, n) array, got shape {matrices.shape}')
+    return matrices
+
+
+def _transpose(matrices):
+    return matrices.transpose(0, 2, 1)
+
+
+def stack_matrices(matrices):
+    """
+    Packs a list of equally sized BooleanMatrix objects into a (batch, n, n) boolean array
+    :param matrices:
+    :return:
+    """
+    matrices = list(matrices)
+    size = matrices[0].size if matrices else 0
+    for matrix in matrices:
+        if matrix.size != size:
+            raise ValueError(f'Expected a (batch, n, n) array, got matrices of sizes {size} and {matrix.size}')
+    if size == 0:
+        return np.zeros((len(matrices), 0, 0), dtype=bool)
+    row_bytes = (size + 7) // 8
+    packed = b''.join(matrix.to_bytes() for matrix in matrices)
+    bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8).reshape(-1, row_bytes), axis=1,
+                         bitorder='little')
+    return bits[:, :size].astype(bool).reshape(len(matrices), size, size)
+
+
+def unstack_matrices(matrices):
+    """
+    Unpacks a (batch, n, n) boolean array into a list of BooleanMatrix objects
+    :param matrices:
+    :return:
+    """
+    matrices = _check_batch(matrices)
+    size = matrices.shape[1]
+    packed = np.packbits(matrices, axis=2, bitorder='little')
+    return [BooleanMatrix(size, [int.from_bytes(row.tobytes(), 'little') for row in matrix])
+            for matrix in packed]
+
+
+def make_reflexive(matrices):
+    """
+    Sets the diagonal of every matrix in the batch to 1
+    :param matrices:
+    :return:
+    """
+    updated_matrices = _check_batch(matrices).copy()
+    diagonal = np.arange(updated_matrices.shape[1])
+    updated_matrices[:, diagonal, diagonal] = True
+    return updated_matrices
+
+
+def make_irreflexive(matrices):
+    """
+    Sets the diagonal of every matrix in the batch to 0
+    :param matrices:
+    :return:
+    """
+    updated_matrices = _check_batch(matrices).copy()
+    diagonal = np.arange(updated_matrices.shape[1])
+    updated_matrices[:, diagonal, diagonal] = False
+    return updated_matrices
+
+
+def make_symmetric(matrices):
+    """
+    Computes A | A.T for every matrix in the batch
+    :param matrices:
+    :return:
+    """
+    matrices = _check_batch(matrices)
+    return matrices | _transpose(matrices)
+
+
+def make_anti_symmetric(matrices):
+    """
+    Clears (j, i) wherever (i, j) above the diagonal is 1, for every matrix in the batch
+    :param matrices:
+    :return:
+    """
+    matrices = _check_batch(matrices)
+    strict_upper = np.triu(np.ones(matrices.shape[1:], dtype=bool), k=1)
+    return matrices & ~_transpose(matrices & strict_upper)
+
+
+def make_asymmetric(matrices):
+    """
+    Clears (j, i) wherever (i, j) above the diagonal is 1, and the diagonal, for every matrix in the batch
+    :param matrices:
+    :return:
+    """
+    matrices = _check_batch(matrices)
+    strict_upper = np.triu(np.ones(matrices.shape[1:], dtype=bool), k=1)
+    off_diagonal = ~np.eye(matrices.shape[1], dtype=bool)
+    return matrices & ~_transpose(matrices & strict_upper) & off_diagonal
+
+
+BATCH_OPERATIONS = {
+    'reflexive': make_reflexive,
+    'irreflexive': make_irreflexive,
+    'symmetric': make_symmetric,
+    'anti_symmetric': make_anti_symmetric,
+    'asymmetric': make_asymmetric,
+}
+
+
+def apply_operation(matrices, operation_name):
+    """
+    Applies the named property operation to every matrix in the batch
+    :param matrices:
+    :param operation_name:
+    :return:
+    """
+    try:
+        operation = BATCH_OPERATIONS[operation_name]
+    except KeyError:
+        raise ValueError(f'Unknown batch operation: {operation_name}') from None
+    return operation(matrices)
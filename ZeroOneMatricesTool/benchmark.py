@@ -0,0 +1,214 @@
+"""
+Benchmarks of the property operations and of database round trips on random relations, e.g.
+
+    python -m ZeroOneMatricesTool.benchmark -o results.json
+    python -m ZeroOneMatricesTool.benchmark --sizes 64,256 --densities 0.05 --repeat 3
+
+Results are written as JSON so that runs on different commits can be compared. Every timed call gets a
+freshly built matrix, so the property fingerprint and closure cached by an earlier call are never reused.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.operations import OPERATIONS
+
+DEFAULT_SIZES = (16, 64, 256, 1024)
+DEFAULT_DENSITIES = (0.01, 0.1, 0.5)
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 0
+
+
+def random_rows(size, density, rng):
+    """
+    Returns the rows of a random size x size relation in which each entry is 1 with probability density
+    :param size:
+    :param density:
+    :param rng:
+    :return:
+    """
+    rows = []
+    for _ in range(size):
+        row_bytes = bytearray((size + 7) // 8)
+        for col in range(size):
+            if rng.random() < density:
+                row_bytes[col >> 3] |= 1 << (col & 7)
+        rows.append(int.from_bytes(row_bytes, 'little'))
+    return rows
+
+
+def time_calls(prepare, repeat):
+    """
+    Times repeat calls, each to a function returned by an untimed call to prepare
+    :param prepare:
+    :param repeat:
+    :return: The time of each call in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        timed_call = prepare()
+        start = time.perf_counter()
+        timed_call()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(benchmark, size, density, timings):
+    return {
+        'benchmark': benchmark,
+        'size': size,
+        'density': density,
+        'repeat': len(timings),
+        'min_seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'mean_seconds': statistics.fmean(timings),
+    }
+
+
+def benchmark_operations(rows, size, density, repeat):
+    """
+    Times each property operation on fresh copies of one relation
+    :param rows:
+    :param size:
+    :param density:
+    :param repeat:
+    :return:
+    """
+    results = []
+    for name, operation in OPERATIONS.items():
+        def prepare_operation():
+            matrix = BooleanMatrix(size, rows)
+            return lambda: operation(matrix)
+
+        results.append(summarize(f'make_{name}', size, density, time_calls(prepare_operation, repeat)))
+    return results
+
+
+def benchmark_database(matrix_database, user_id, rows, size, density, repeat):
+    """
+    Times saving a relation and loading it back with the matrix cache cleared, so each load reads the database
+    :param matrix_database:
+    :param user_id:
+    :param rows:
+    :param size:
+    :param density:
+    :param repeat:
+    :return:
+    """
+    matrix = BooleanMatrix(size, rows)
+    saved_ids = []
+
+    def save():
+        with matrix_database.session_scope() as session:
+            name = f'benchmark-{size}-{density}-{len(saved_ids)}'
+            saved_ids.append(matrix_database.save_matrix(session, user_id, name, matrix, datetime.now()))
+
+    def load():
+        with matrix_database.session_scope() as session:
+            loaded_matrix = matrix_database.load_matrix(session, saved_ids[-1])
+        if loaded_matrix != matrix:
+            raise AssertionError(f'Matrix {saved_ids[-1]} changed in a save and load round trip')
+
+    def prepare_load():
+        matrix_database.matrix_cache.clear()
+        return load
+
+    return [summarize('save_matrix', size, density, time_calls(lambda: save, repeat)),
+            summarize('load_matrix', size, density, time_calls(prepare_load, repeat))]
+
+
+def create_benchmark_database():
+    """
+    Creates an in-memory database with one user to save matrices under
+    :return: The database and the user's id
+    """
+    from ZeroOneMatricesTool.database import MatrixDatabase, User  # SQLAlchemy is only imported when used
+    matrix_database = MatrixDatabase(MatrixDatabase.construct_in_memory_url())
+    matrix_database.ensure_tables_exist()
+    with matrix_database.session_scope() as session:
+        user = User(username='benchmark')
+        session.add(user)
+        session.flush()
+        user_id = user.user_id
+    return matrix_database, user_id
+
+
+def current_commit():
+    """
+    Returns the git commit being benchmarked, or None outside a git checkout
+    :return:
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, densities=DEFAULT_DENSITIES, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED,
+                   include_database=True):
+    """
+    Runs every benchmark on a random relation of each size and density
+    :param sizes:
+    :param densities:
+    :param repeat: Number of timed calls per benchmark
+    :param seed: Seed of the random relations, so runs benchmark the same inputs
+    :param include_database: Whether to time database round trips, which need SQLAlchemy
+    :return: A JSON serializable report
+    """
+    rng = random.Random(seed)
+    if include_database:
+        matrix_database, user_id = create_benchmark_database()
+    results = []
+    for size in sizes:
+        for density in densities:
+            rows = random_rows(size, density, rng)
+            results.extend(benchmark_operations(rows, size, density, repeat))
+            if include_database:
+                results.extend(benchmark_database(matrix_database, user_id, rows, size, density, repeat))
+    return {
+        'commit': current_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'results': results,
+    }
+
+
+def parse_list(text, convert):
+    return tuple(convert(item) for item in text.split(',') if item.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ZeroOneMatricesTool.benchmark',
+                                     description='Benchmark the property operations and database round trips.')
+    parser.add_argument('--sizes', type=lambda text: parse_list(text, int), default=DEFAULT_SIZES,
+                        help='comma separated matrix sizes')
+    parser.add_argument('--densities', type=lambda text: parse_list(text, float), default=DEFAULT_DENSITIES,
+                        help='comma separated fractions of 1 entries')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timed calls per benchmark')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--skip-database', action='store_true', help='only benchmark the property operations')
+    parser.add_argument('-o', '--output', default='-', help="JSON file to write, '-' for stdout")
+    arguments = parser.parse_args(argv)
+    report = run_benchmarks(arguments.sizes, arguments.densities, arguments.repeat, arguments.seed,
+                            not arguments.skip_database)
+    if arguments.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(arguments.output, 'w') as stream:
+            json.dump(report, stream, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
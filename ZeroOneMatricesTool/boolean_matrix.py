@@ -0,0 +1,433 @@
+import math
+
+from ZeroOneMatricesTool.composition import boolean_power, boolean_product, reachability_within
+from ZeroOneMatricesTool.closure import equivalence_closure, insert_into_transitive_closure, \
+    is_implied_in_transitive_relation, iterate_bits, transitive_closure
+
+# Bits of the property fingerprint cached on each matrix
+REFLEXIVE = 1 << 0
+IRREFLEXIVE = 1 << 1
+SYMMETRIC = 1 << 2
+ANTI_SYMMETRIC = 1 << 3
+ASYMMETRIC = 1 << 4
+TRANSITIVE = 1 << 5
+EQUIVALENCE = 1 << 6
+ALL_PROPERTIES = (1 << 7) - 1
+
+
+class BooleanMatrix(object):
+    """
+    A square 0-1 matrix stored as one Python int per row.
+
+    Bit j of rows[i] holds the entry at (i, j), so a cell lookup is a shift and a mask, and whole-row
+    operations (OR, AND, complement) run at machine word speed inside the interpreter. Matrices are treated
+    as immutable: every operation returns a new BooleanMatrix, or the matrix itself when it already has the
+    property, and leaves the original untouched. That is what makes the cached property fingerprint safe.
+    """
+
+    __slots__ = ('size', 'rows', 'checked_properties', 'properties', 'closure')
+
+    def __init__(self, size, rows=None, properties=0):
+        self.size = size
+        if rows is None:
+            self.rows = [0] * size
+        else:
+            self.rows = list(rows)
+        self.checked_properties = properties  # Fingerprint bits that have been computed so far
+        self.properties = properties  # Fingerprint bits known to hold
+        self.closure = None  # The transitive closure, when it is known without computing it
+
+    @classmethod
+    def identity(cls, size):
+        """
+        Builds the size x size identity matrix
+        :param size:
+        :return:
+        """
+        return cls(size, [1 << i for i in range(size)])
+
+    @classmethod
+    def from_dict(cls, matrix_dict):
+        """
+        Builds a matrix from the 'row,col' -> '0'/'1' dictionary format used by the matrix editor
+        :param matrix_dict:
+        :return:
+        """
+        size = math.isqrt(len(matrix_dict))
+        rows = [0] * size
+        for key, value in matrix_dict.items():
+            if str(value) == '1':
+                row, col = map(int, key.split(','))
+                rows[row] |= 1 << col
+        return cls(size, rows)
+
+    @classmethod
+    def from_bytes(cls, size, packed):
+        """
+        Builds a matrix from the packed format written by to_bytes
+        :param size:
+        :param packed:
+        :return:
+        """
+        row_bytes = (size + 7) // 8
+        packed = memoryview(packed)
+        return cls(size, [int.from_bytes(packed[i * row_bytes:(i + 1) * row_bytes], 'little') for i in range(size)])
+
+    def to_bytes(self):
+        """
+        Packs the matrix row by row, each row taking (size + 7) // 8 little-endian bytes
+        :return:
+        """
+        row_bytes = (self.size + 7) // 8
+        return b''.join(row.to_bytes(row_bytes, 'little') for row in self.rows)
+
+    def to_dict(self):
+        """
+        Converts the matrix to the 'row,col' -> '0'/'1' dictionary format used by the matrix editor
+        :return:
+        """
+        matrix_dict = {}
+        for i, row in enumerate(self.rows):
+            for j in range(self.size):
+                matrix_dict[f'{i},{j}'] = '1' if row >> j & 1 else '0'
+        return matrix_dict
+
+    def get(self, row, col):
+        """
+        Returns the entry at (row, col) as 0 or 1
+        :param row:
+        :param col:
+        :return:
+        """
+        return self.rows[row] >> col & 1
+
+    def with_cell(self, row, col, value):
+        """
+        Returns a copy of the matrix with the entry at (row, col) set to value.
+
+        If the transitive closure of the matrix is known, the closure of the copy is kept up to date
+        incrementally: an insertion extends the known closure, and a removal from a transitive matrix either
+        leaves it transitive or is undone by closure. Any other removal forgets the closure, so it is
+        recomputed only if make_transitive is called again.
+        :param row:
+        :param col:
+        :param value:
+        :return:
+        """
+        rows = list(self.rows)
+        if value:
+            rows[row] |= 1 << col
+        else:
+            rows[row] &= ~(1 << col)
+        updated_matrix = BooleanMatrix(self.size, rows)
+        known_closure = self.known_closure()
+        if known_closure is not None:
+            if value:
+                closed_rows = insert_into_transitive_closure(known_closure.rows, self.size, row, col)
+                if closed_rows == rows:
+                    updated_matrix.mark_transitive()
+                else:
+                    updated_matrix.closure = BooleanMatrix(self.size, closed_rows, TRANSITIVE)
+            elif known_closure is self:
+                if is_implied_in_transitive_relation(self.rows, row, col):
+                    updated_matrix.closure = self
+                else:
+                    updated_matrix.mark_transitive()
+        return updated_matrix
+
+    def known_closure(self):
+        """
+        Returns the transitive closure of the matrix if it is known without computing it, otherwise None
+        :return:
+        """
+        if self.checked_properties & self.properties & TRANSITIVE:
+            return self
+        return self.closure
+
+    def mark_transitive(self):
+        self.checked_properties |= TRANSITIVE
+        self.properties |= TRANSITIVE
+
+    def row(self, index):
+        """
+        Returns the row at index as a bitmask, bit j being the entry in column j
+        :param index:
+        :return:
+        """
+        return self.rows[index]
+
+    def column(self, index):
+        """
+        Returns the column at index as a bitmask, bit i being the entry in row i
+        :param index:
+        :return:
+        """
+        column = 0
+        for i, row in enumerate(self.rows):
+            if row >> index & 1:
+                column |= 1 << i
+        return column
+
+    def ones(self):
+        """
+        Yields the (row, col) position of every 1 entry in row-major order
+        :return:
+        """
+        for i, row in enumerate(self.rows):
+            while row:
+                low_bit = row & -row
+                yield i, low_bit.bit_length() - 1
+                row ^= low_bit
+
+    def count_ones(self):
+        return sum(row.bit_count() for row in self.rows)
+
+    def transpose(self):
+        """
+        Returns the transpose of the matrix, touching only the 1 entries
+        :return:
+        """
+        rows = [0] * self.size
+        for i, j in self.ones():
+            rows[j] |= 1 << i
+        return BooleanMatrix(self.size, rows)
+
+    def copy(self):
+        copied_matrix = BooleanMatrix(self.size, self.rows)
+        copied_matrix.checked_properties = self.checked_properties
+        copied_matrix.properties = self.properties
+        copied_matrix.closure = self.closure
+        return copied_matrix
+
+    def __eq__(self, other):
+        if not isinstance(other, BooleanMatrix):
+            return NotImplemented
+        return self.size == other.size and self.rows == other.rows
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'BooleanMatrix(size={self.size}, ones={self.count_ones()})'
+
+    '''
+    Property checks
+    '''
+
+    def has_property(self, flag):
+        """
+        Returns whether the property flag holds, computing and caching it on first use
+        :param flag:
+        :return:
+        """
+        if not self.checked_properties & flag:
+            if PROPERTY_CHECKS[flag](self):
+                self.properties |= flag
+            self.checked_properties |= flag
+        return bool(self.properties & flag)
+
+    def fingerprint(self):
+        """
+        Returns the bitmask of every property that holds for the matrix
+        :return:
+        """
+        for flag in PROPERTY_CHECKS:
+            self.has_property(flag)
+        return self.properties
+
+    def is_reflexive(self):
+        return self.has_property(REFLEXIVE)
+
+    def is_irreflexive(self):
+        return self.has_property(IRREFLEXIVE)
+
+    def is_symmetric(self):
+        return self.has_property(SYMMETRIC)
+
+    def is_antisymmetric(self):
+        return self.has_property(ANTI_SYMMETRIC)
+
+    def is_asymmetric(self):
+        return self.has_property(ASYMMETRIC)
+
+    def is_transitive(self):
+        return self.has_property(TRANSITIVE)
+
+    def is_equivalence(self):
+        return self.has_property(EQUIVALENCE)
+
+    def _check_reflexive(self):
+        return all(row >> i & 1 for i, row in enumerate(self.rows))
+
+    def _check_irreflexive(self):
+        return not any(row >> i & 1 for i, row in enumerate(self.rows))
+
+    def _check_symmetric(self):
+        rows = self.rows
+        for i, row in enumerate(rows):
+            for j in iterate_bits(row):
+                if not rows[j] >> i & 1:
+                    return False
+        return True
+
+    def _check_anti_symmetric(self):
+        rows = self.rows
+        for i, row in enumerate(rows):
+            for j in iterate_bits(row >> (i + 1) << (i + 1)):
+                if rows[j] >> i & 1:
+                    return False
+        return True
+
+    def _check_asymmetric(self):
+        return self.is_irreflexive() and self.is_antisymmetric()
+
+    def _check_transitive(self):
+        rows = self.rows
+        for row in rows:
+            for k in iterate_bits(row):
+                if rows[k] & ~row:
+                    return False
+        return True
+
+    def _check_equivalence(self):
+        return self.is_reflexive() and self.is_symmetric() and self.is_transitive()
+
+    '''
+    Property operations, each returning the matrix itself when it already has the property
+    '''
+
+    def make_reflexive(self):
+        """
+        Returns the matrix with every diagonal entry set to 1
+        :return:
+        """
+        if self.is_reflexive():
+            return self
+        return BooleanMatrix(self.size, [row | 1 << i for i, row in enumerate(self.rows)], REFLEXIVE)
+
+    def make_irreflexive(self):
+        """
+        Returns the matrix with every diagonal entry set to 0
+        :return:
+        """
+        if self.is_irreflexive():
+            return self
+        return BooleanMatrix(self.size, [row & ~(1 << i) for i, row in enumerate(self.rows)], IRREFLEXIVE)
+
+    def make_symmetric(self):
+        """
+        Returns the symmetric closure of the matrix
+        :return:
+        """
+        if self.is_symmetric():
+            return self
+        transposed = self.transpose()
+        return BooleanMatrix(self.size, [row | transposed_row for row, transposed_row in
+                                         zip(self.rows, transposed.rows)], SYMMETRIC)
+
+    def make_anti_symmetric(self):
+        """
+        Returns the matrix with (j, i) cleared wherever (i, j) above the diagonal is 1, keeping the diagonal
+        :return:
+        """
+        if self.is_antisymmetric():
+            return self
+        rows = list(self.rows)
+        for i, row in enumerate(self.rows):
+            for j in iterate_bits(row >> (i + 1) << (i + 1)):  # Entries strictly above the diagonal
+                rows[j] &= ~(1 << i)
+        return BooleanMatrix(self.size, rows, ANTI_SYMMETRIC)
+
+    def make_asymmetric(self):
+        """
+        Returns the matrix with (j, i) cleared wherever (i, j) above the diagonal is 1, and the diagonal cleared
+        :return:
+        """
+        if self.is_asymmetric():
+            return self
+        asymmetric_matrix = self.make_anti_symmetric().make_irreflexive()
+        asymmetric_matrix.properties |= ANTI_SYMMETRIC | ASYMMETRIC
+        asymmetric_matrix.checked_properties |= ANTI_SYMMETRIC | ASYMMETRIC
+        return asymmetric_matrix
+
+    def make_transitive(self, progress=None):
+        """
+        Returns the transitive closure of the matrix
+        :param progress: Called as progress(done, total) while the closure is computed, and may raise to abandon it
+        :return:
+        """
+        if self.closure is not None:
+            return self.closure
+        if self.is_transitive():
+            return self
+        self.closure = BooleanMatrix(self.size, transitive_closure(self.rows, self.size, progress), TRANSITIVE)
+        return self.closure
+
+    def make_equivalent(self):
+        """
+        Returns the equivalence closure of the matrix
+        :return:
+        """
+        if self.is_equivalence():
+            return self
+        return self.equivalence_closure()[0]
+
+    def equivalence_closure(self):
+        """
+        Returns the equivalence closure of the matrix together with its equivalence classes
+        :return: The closed matrix and the classes as sorted lists of elements
+        """
+        closed_rows, classes = equivalence_closure(self.rows, self.size)
+        return BooleanMatrix(self.size, closed_rows, REFLEXIVE | SYMMETRIC | TRANSITIVE | EQUIVALENCE), classes
+
+    '''
+    Composition
+    '''
+
+    def compose(self, other):
+        """
+        Returns the composition relating i to k whenever this matrix relates i to some j and other relates j to k,
+        i.e. the boolean matrix product of this matrix and other
+        :param other:
+        :return:
+        """
+        if other.size != self.size:
+            raise ValueError(f'Cannot compose matrices of sizes {self.size} and {other.size}')
+        return BooleanMatrix(self.size, boolean_product(self.rows, other.rows, self.size))
+
+    def power(self, exponent):
+        """
+        Returns the matrix composed with itself exponent times, computed by repeated squaring
+        :param exponent: A non-negative integer; the 0th power is the identity
+        :return:
+        """
+        if exponent < 0:
+            raise ValueError(f'Matrix powers must be non-negative, not {exponent}')
+        if exponent == 1:
+            return self
+        return BooleanMatrix(self.size, boolean_power(self.rows, self.size, exponent))
+
+    def reachable_within(self, steps):
+        """
+        Returns the matrix relating i to j whenever j can be reached from i along a path of 1 to steps entries.
+        Paths longer than size never reach anything new, so from there on this is the transitive closure.
+        :param steps: A non-negative integer
+        :return:
+        """
+        if steps < 0:
+            raise ValueError(f'Step counts must be non-negative, not {steps}')
+        if steps >= self.size or (steps >= 1 and self.known_closure() is self):
+            return self.make_transitive()
+        if steps == 1:
+            return self
+        return BooleanMatrix(self.size, reachability_within(self.rows, self.size, steps))
+
+
+PROPERTY_CHECKS = {
+    REFLEXIVE: BooleanMatrix._check_reflexive,
+    IRREFLEXIVE: BooleanMatrix._check_irreflexive,
+    SYMMETRIC: BooleanMatrix._check_symmetric,
+    ANTI_SYMMETRIC: BooleanMatrix._check_anti_symmetric,
+    ASYMMETRIC: BooleanMatrix._check_asymmetric,
+    TRANSITIVE: BooleanMatrix._check_transitive,
+    EQUIVALENCE: BooleanMatrix._check_equivalence,
+}
@@ -0,0 +1,64 @@
+import sys
+from collections import OrderedDict
+
+
+def matrix_memory_size(matrix):
+    return sys.getsizeof(matrix.rows) + sum(sys.getsizeof(row) for row in matrix.rows)
+
+
+class LRUCache(object):
+    """
+    A least-recently-used cache bounded by the total byte size of its values rather than their count
+    """
+
+    def __init__(self, max_bytes, size_of):
+        self.max_bytes = max_bytes
+        self.size_of = size_of  # Function returning the byte size of a value
+        self.entries = OrderedDict()  # key -> (value, byte size), least recently used first
+        self.size_bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """
+        Returns the value for key and marks it as most recently used
+        :param key:
+        :param default:
+        :return:
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value):
+        """
+        Stores value under key, evicting least recently used entries to stay within max_bytes. Values
+        larger than max_bytes on their own are not stored.
+        :param key:
+        :param value:
+        :return:
+        """
+        self.invalidate(key)
+        value_bytes = self.size_of(value)
+        if value_bytes > self.max_bytes:
+            return
+        self.entries[key] = (value, value_bytes)
+        self.size_bytes += value_bytes
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted_bytes) = self.entries.popitem(last=False)
+            self.size_bytes -= evicted_bytes
+
+    def invalidate(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+    def clear(self):
+        self.entries.clear()
+        self.size_bytes = 0
@@ -0,0 +1,278 @@
+"""
+Command line entry point for processing matrices without the GUI, e.g.
+
+    python -m ZeroOneMatricesTool.cli apply --ops reflexive,transitive < relations.txt > closed.txt
+    python -m ZeroOneMatricesTool.cli convert -i relations.csv --input-format csv -o relations.zom --output-format binary
+    python -m ZeroOneMatricesTool.cli compose --right successor.txt < relations.txt > composed.txt
+    python -m ZeroOneMatricesTool.cli enumerate --size 4 --properties reflexive,anti_symmetric,transitive --count
+    python -m ZeroOneMatricesTool.cli export --user alice -o alice.zoml
+
+Only the pure matrix modules are imported so that start up stays fast.
+"""
+import argparse
+import sys
+from contextlib import contextmanager
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.matrix_io import TEXT_READERS, TEXT_WRITERS
+from ZeroOneMatricesTool.operations import OPERATIONS, apply_operations, parse_operation_names
+from ZeroOneMatricesTool.relation_file import RelationFileReader, RelationFileWriter
+from ZeroOneMatricesTool.sparse_matrix import to_dense
+
+FORMATS = ('text', 'csv', 'edges', 'binary')
+
+
+@contextmanager
+def open_matrix_reader(path, matrix_format):
+    """
+    Provides an iterator over the matrices in path ('-' for stdin), read lazily
+    :param path:
+    :param matrix_format:
+    :return:
+    """
+    if matrix_format == 'binary':
+        if path == '-':
+            raise ValueError('Binary relation files must be read from a file, not stdin')
+        with RelationFileReader(path) as reader:
+            yield iter(reader)
+    elif path == '-':
+        yield TEXT_READERS[matrix_format](sys.stdin)
+    else:
+        with open(path) as stream:
+            yield TEXT_READERS[matrix_format](stream)
+
+
+@contextmanager
+def open_matrix_writer(path, matrix_format):
+    """
+    Provides a function writing one matrix at a time to path ('-' for stdout)
+    :param path:
+    :param matrix_format:
+    :return:
+    """
+    if matrix_format == 'binary':
+        if path == '-':
+            raise ValueError('Binary relation files must be written to a file, not stdout')
+        with RelationFileWriter(path) as writer:
+            yield writer.write
+    elif path == '-':
+        yield lambda matrix: TEXT_WRITERS[matrix_format](sys.stdout, matrix)
+    else:
+        with open(path, 'w') as stream:
+            yield lambda matrix: TEXT_WRITERS[matrix_format](stream, matrix)
+
+
+def apply_command(arguments):
+    operation_names = parse_operation_names(arguments.ops)
+    with open_matrix_reader(arguments.input, arguments.input_format) as matrices, \
+            open_matrix_writer(arguments.output, arguments.output_format) as write_matrix:
+        if arguments.workers > 1:
+            from ZeroOneMatricesTool.parallel import run_parallel  # Multiprocessing is only imported when used
+            results = run_parallel(matrices, operation_names, arguments.workers, arguments.chunk_size)
+        else:
+            results = (apply_operations(matrix, operation_names) for matrix in matrices)
+        for result in results:
+            write_matrix(to_dense(result))
+    return 0
+
+
+def convert_command(arguments):
+    with open_matrix_reader(arguments.input, arguments.input_format) as matrices, \
+            open_matrix_writer(arguments.output, arguments.output_format) as write_matrix:
+        for matrix in matrices:
+            write_matrix(matrix)
+    return 0
+
+
+def compose_command(arguments):
+    with open_matrix_reader(arguments.right, arguments.right_format) as right_matrices:
+        right_matrix = to_dense(next(right_matrices, None) or BooleanMatrix(0))
+    with open_matrix_reader(arguments.input, arguments.input_format) as matrices, \
+            open_matrix_writer(arguments.output, arguments.output_format) as write_matrix:
+        for matrix in matrices:
+            write_matrix(to_dense(matrix).compose(right_matrix))
+    return 0
+
+
+def power_command(arguments):
+    if arguments.k < 0:
+        raise ValueError('k must not be negative')
+    with open_matrix_reader(arguments.input, arguments.input_format) as matrices, \
+            open_matrix_writer(arguments.output, arguments.output_format) as write_matrix:
+        for matrix in matrices:
+            write_matrix(to_dense(matrix).power(arguments.k))
+    return 0
+
+
+def reachable_command(arguments):
+    if arguments.k < 0:
+        raise ValueError('k must not be negative')
+    with open_matrix_reader(arguments.input, arguments.input_format) as matrices, \
+            open_matrix_writer(arguments.output, arguments.output_format) as write_matrix:
+        for matrix in matrices:
+            write_matrix(to_dense(matrix).reachable_within(arguments.k))
+    return 0
+
+
+def enumerate_command(arguments):
+    from ZeroOneMatricesTool.enumeration import count_relations, enumerate_relations, parse_property_names
+    if arguments.size < 0:
+        raise ValueError('The size must not be negative')
+    properties = parse_property_names(arguments.properties)
+    if arguments.count:
+        print(count_relations(arguments.size, properties, arguments.up_to_isomorphism, arguments.workers))
+        return 0
+    with open_matrix_writer(arguments.output, arguments.output_format) as write_matrix:
+        for matrix in enumerate_relations(arguments.size, properties, arguments.up_to_isomorphism):
+            write_matrix(matrix)
+    return 0
+
+
+def open_matrix_database(url):
+    from ZeroOneMatricesTool.database import MatrixDatabase, get_matrix_database  # SQLAlchemy is only imported here
+    return MatrixDatabase(url) if url else get_matrix_database()
+
+
+def report_transfer(verb):
+    return lambda transfer: print(f'\r{verb} {transfer.describe()}', end='', file=sys.stderr, flush=True)
+
+
+def export_command(arguments):
+    from ZeroOneMatricesTool.library_transfer import export_library
+    matrix_database = open_matrix_database(arguments.url)
+    progress = None if arguments.quiet else report_transfer('Exported')
+    if arguments.output == '-':
+        export_library(matrix_database, arguments.user, sys.stdout, arguments.batch_size, progress)
+    else:
+        with open(arguments.output, 'w') as stream:
+            export_library(matrix_database, arguments.user, stream, arguments.batch_size, progress)
+    if progress is not None:
+        print(file=sys.stderr)
+    return 0
+
+
+def import_command(arguments):
+    from ZeroOneMatricesTool.library_transfer import import_library
+    matrix_database = open_matrix_database(arguments.url)
+    matrix_database.ensure_tables_exist()
+    progress = None if arguments.quiet else report_transfer('Imported')
+    if arguments.input == '-':
+        import_library(matrix_database, sys.stdin, arguments.user, arguments.batch_size, progress,
+                       arguments.on_existing)
+    else:
+        with open(arguments.input) as stream:
+            import_library(matrix_database, stream, arguments.user, arguments.batch_size, progress,
+                           arguments.on_existing)
+    if progress is not None:
+        print(file=sys.stderr)
+    return 0
+
+
+def add_database_arguments(parser):
+    parser.add_argument('--url',
+                        help='SQLAlchemy URL of the database, e.g. sqlite:///matrices.db (default: from config.json)')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Number of matrices read or written at a time (default: 500)')
+    parser.add_argument('--quiet', action='store_true', help='Do not report progress on stderr')
+
+
+def add_input_output_arguments(parser):
+    parser.add_argument('-i', '--input', default='-',
+                        help='File to read the matrices from (default: stdin)')
+    parser.add_argument('--input-format', choices=FORMATS, default='text',
+                        help='Format of the input: text (one line of 0s and 1s per row), csv, edges '
+                             '(element count, then one "row col" line per 1 entry) or binary (default: text)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='File to write the results to (default: stdout)')
+    parser.add_argument('--output-format', choices=FORMATS, default='text',
+                        help='Format of the output (default: text)')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m ZeroOneMatricesTool.cli',
+                                     description='Process 0-1 matrices without the GUI.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    apply_parser = subparsers.add_parser('apply', help='Apply property operations to every matrix in the input')
+    apply_parser.add_argument('--ops', required=True,
+                              help=f'Comma separated operations to apply in order: {", ".join(OPERATIONS)}')
+    add_input_output_arguments(apply_parser)
+    apply_parser.add_argument('--workers', type=int, default=1,
+                              help='Number of worker processes to spread the matrices over (default: 1)')
+    apply_parser.add_argument('--chunk-size', type=int, default=16,
+                              help='Number of matrices sent to a worker process at a time (default: 16)')
+    apply_parser.set_defaults(handler=apply_command)
+
+    convert_parser = subparsers.add_parser('convert', help='Convert matrices from one file format to another')
+    add_input_output_arguments(convert_parser)
+    convert_parser.set_defaults(handler=convert_command)
+
+    compose_parser = subparsers.add_parser('compose',
+                                           help='Compose every matrix in the input with a fixed right hand matrix')
+    compose_parser.add_argument('--right', required=True,
+                                help='File holding the matrix each input matrix is composed with (its first matrix)')
+    compose_parser.add_argument('--right-format', choices=FORMATS, default='text',
+                                help='Format of the right hand matrix file (default: text)')
+    add_input_output_arguments(compose_parser)
+    compose_parser.set_defaults(handler=compose_command)
+
+    power_parser = subparsers.add_parser('power', help='Raise every matrix in the input to the k-th power')
+    power_parser.add_argument('-k', type=int, required=True, help='The exponent; the 0th power is the identity')
+    add_input_output_arguments(power_parser)
+    power_parser.set_defaults(handler=power_command)
+
+    reachable_parser = subparsers.add_parser('reachable',
+                                             help='Relate each element to every element it reaches within k steps')
+    reachable_parser.add_argument('-k', type=int, required=True, help='The largest number of steps')
+    add_input_output_arguments(reachable_parser)
+    reachable_parser.set_defaults(handler=reachable_command)
+
+    enumerate_parser = subparsers.add_parser('enumerate',
+                                             help='Write or count every matrix of a size having the given properties')
+    enumerate_parser.add_argument('--size', type=int, required=True, help='Number of elements')
+    enumerate_parser.add_argument('--properties', default='',
+                                  help=f'Comma separated properties every matrix must have: {", ".join(OPERATIONS)}')
+    enumerate_parser.add_argument('--up-to-isomorphism', action='store_true',
+                                  help='Only keep one matrix of each set that differ by a relabelling of the elements')
+    enumerate_parser.add_argument('--count', action='store_true',
+                                  help='Print the number of matrices instead of the matrices')
+    enumerate_parser.add_argument('--workers', type=int, default=None,
+                                  help='Number of worker processes counting (default: one per CPU)')
+    enumerate_parser.add_argument('-o', '--output', default='-',
+                                  help='File to write the matrices to (default: stdout)')
+    enumerate_parser.add_argument('--output-format', choices=FORMATS, default='text',
+                                  help='Format of the output (default: text)')
+    enumerate_parser.set_defaults(handler=enumerate_command)
+
+    export_parser = subparsers.add_parser('export', help="Write every matrix a user has saved to a library file")
+    export_parser.add_argument('--user', required=True, help='Name of the user whose matrices are exported')
+    export_parser.add_argument('-o', '--output', default='-',
+                               help='File to write the library to (default: stdout)')
+    add_database_arguments(export_parser)
+    export_parser.set_defaults(handler=export_command)
+
+    import_parser = subparsers.add_parser('import', help="Add the matrices in a library file to a user's matrices")
+    import_parser.add_argument('--user',
+                               help='Name of the user to import into, created if needed (default: the user the '
+                                    'library was exported from)')
+    import_parser.add_argument('-i', '--input', default='-',
+                               help='File to read the library from (default: stdin)')
+    import_parser.add_argument('--on-existing', choices=('skip', 'rename', 'fail'), default='skip',
+                               help='What to do with a matrix whose name the user already has: skip it, rename it '
+                                    'by appending a number, or stop with an error (default: skip)')
+    add_database_arguments(import_parser)
+    import_parser.set_defaults(handler=import_command)
+    return parser
+
+
+def main(argv=None):
+    arguments = build_parser().parse_args(argv)
+    try:
+        return arguments.handler(arguments)
+    except (OSError, ValueError) as exception:
+        print(f'Error: {exception}', file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
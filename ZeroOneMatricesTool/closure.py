@@ -0,0 +1,267 @@
+"""
+Transitive closure kernels working on bitset rows, where bit j of rows[i] is the entry at (i, j)
+"""
+
+WARSHALL_MAX_SIZE = 64  # Below this size Warshall's algorithm beats the setup cost of condensation
+CONDENSATION_MAX_DENSITY = 0.1  # Fraction of 1 entries under which condensation is used for larger matrices
+
+
+def iterate_bits(mask):
+    """
+    Yields the position of every set bit in mask, lowest first
+    :param mask:
+    :return:
+    """
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def warshall_closure(rows, size, progress=None):
+    """
+    Computes the transitive closure with Warshall's algorithm, ORing whole rows at each step
+    :param rows:
+    :param size:
+    :param progress: Called as progress(done, total) after each step, and may raise to abandon the closure
+    :return:
+    """
+    rows = list(rows)
+    for k in range(size):
+        k_bit = 1 << k
+        row_k = rows[k]
+        for i in range(size):
+            if rows[i] & k_bit:
+                rows[i] |= row_k
+        if progress is not None:
+            progress(k + 1, size)
+    return rows
+
+
+def strongly_connected_components(successors, size):
+    """
+    Finds the strongly connected components with an iterative version of Tarjan's algorithm, in time linear
+    in the number of edges
+    :param successors: Called as successors(vertex), returning an iterable over the successors of vertex
+    :param size:
+    :return: The list of components in reverse topological order, and the component number of each vertex
+    """
+    index = [-1] * size
+    low_link = [0] * size
+    component_of = [-1] * size
+    components = []
+    stack = []
+    on_stack = [False] * size
+    next_index = 0
+    for root in range(size):
+        if index[root] != -1:
+            continue
+        index[root] = low_link[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(successors(root)))]
+        while work:
+            vertex, remaining = work[-1]
+            successor = next(remaining, -1)
+            if successor != -1:
+                if index[successor] == -1:
+                    index[successor] = low_link[successor] = next_index
+                    next_index += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    work.append((successor, iter(successors(successor))))
+                elif on_stack[successor] and index[successor] < low_link[vertex]:
+                    low_link[vertex] = index[successor]
+                continue
+            work.pop()
+            if work and low_link[vertex] < low_link[work[-1][0]]:
+                low_link[work[-1][0]] = low_link[vertex]
+            if low_link[vertex] == index[vertex]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component_of[member] = len(components)
+                    component.append(member)
+                    if member == vertex:
+                        break
+                components.append(component)
+    return components, component_of
+
+
+def condensation_closure(rows, size, progress=None):
+    """
+    Computes the transitive closure by collapsing strongly connected components and propagating
+    reachability over the resulting DAG, skipping successors already known to be reachable
+    :param rows:
+    :param size:
+    :param progress: Called as progress(done, total) after each component is condensed and again after its
+    reachability is known, and may raise to abandon the closure
+    :return:
+    """
+    components, component_of = strongly_connected_components(lambda vertex: iterate_bits(rows[vertex]), size)
+    total = 2 * len(components)
+    member_masks = []
+    successor_masks = []  # Successor components, one bit per component number
+    cyclic = []
+    for number, component in enumerate(components):
+        members = 0
+        out_edges = 0
+        for vertex in component:
+            members |= 1 << vertex
+            out_edges |= rows[vertex]
+        successors = 0
+        for successor in iterate_bits(out_edges & ~members):
+            successors |= 1 << component_of[successor]
+        member_masks.append(members)
+        cyclic.append(len(component) > 1 or bool(out_edges & members))
+        successor_masks.append(successors)
+        if progress is not None:
+            progress(number + 1, total)
+    reach_vertices = condensed_reachability(
+        member_masks, successor_masks, cyclic,
+        None if progress is None else lambda done, _: progress(len(components) + done, total))
+    return [reach_vertices[component_of[vertex]] for vertex in range(size)]
+
+
+def condensed_reachability(member_masks, successor_masks, cyclic, progress=None):
+    """
+    Propagates reachability over a condensation whose components are numbered in reverse topological order
+    :param member_masks: The vertices of each component as a bitmask
+    :param successor_masks: The successor components of each component as a bitmask of component numbers
+    :param cyclic: Whether each component reaches itself, i.e. has several vertices or a self loop
+    :param progress: Called as progress(done, total) after each component, and may raise to abandon it
+    :return: The vertices reachable from each component as a bitmask
+    """
+    # Tarjan emits sinks first, so every successor of a component has a smaller number than it
+    reach_components = []
+    reach_vertices = []
+    for number in range(len(member_masks)):
+        reached_components = 0
+        reached_vertices = member_masks[number] if cyclic[number] else 0
+        remaining = successor_masks[number]
+        while remaining:
+            successor = remaining.bit_length() - 1  # Nearest successor first, it tends to cover the others
+            successor_bit = 1 << successor
+            reached_components |= reach_components[successor] | successor_bit
+            reached_vertices |= reach_vertices[successor] | member_masks[successor]
+            remaining &= ~reached_components
+        reach_components.append(reached_components)
+        reach_vertices.append(reached_vertices)
+        if progress is not None:
+            progress(number + 1, len(member_masks))
+    return reach_vertices
+
+
+def transitive_closure(rows, size, progress=None):
+    """
+    Computes the transitive closure, picking Warshall's algorithm for small or dense matrices and
+    strongly connected component condensation for large sparse ones
+    :param rows:
+    :param size:
+    :param progress: Called as progress(done, total) as the closure advances, and may raise to abandon it
+    :return:
+    """
+    if size <= WARSHALL_MAX_SIZE:
+        return warshall_closure(rows, size, progress)
+    ones = sum(row.bit_count() for row in rows)
+    if ones <= CONDENSATION_MAX_DENSITY * size * size:
+        return condensation_closure(rows, size, progress)
+    return warshall_closure(rows, size, progress)
+
+
+def find_root(parent, element):
+    """
+    Returns the root of element's set in a union-find parent list, compressing the path to it
+    :param parent:
+    :param element:
+    :return:
+    """
+    root = element
+    while parent[root] != root:
+        root = parent[root]
+    while parent[element] != root:
+        parent[element], element = root, parent[element]
+    return root
+
+
+def equivalence_classes(rows, size):
+    """
+    Partitions the elements into the classes of the equivalence closure using union-find. Each root keeps
+    the members of its class as a bitmask, so the 1 entries of a row that fall in its own class are skipped
+    with one mask operation; only entries leading to another class cost a find, and each of those merges
+    two classes, so there are at most size - 1 of them in total.
+    :param rows:
+    :param size:
+    :return: The classes as sorted lists of elements, ordered by their smallest element
+    """
+    parent = list(range(size))
+    class_masks = [1 << element for element in range(size)]  # Only up to date for roots
+    for i in range(size):
+        root_i = find_root(parent, i)
+        remaining = rows[i] & ~class_masks[root_i]
+        while remaining:
+            root_j = find_root(parent, (remaining & -remaining).bit_length() - 1)
+            if root_j < root_i:  # Keep the smallest element as the root
+                root_i, root_j = root_j, root_i
+            parent[root_j] = root_i
+            class_masks[root_i] |= class_masks[root_j]
+            remaining &= ~class_masks[root_i]
+    classes = {}
+    for element in range(size):
+        classes.setdefault(find_root(parent, element), []).append(element)
+    return list(classes.values())
+
+
+def equivalence_closure(rows, size):
+    """
+    Computes the equivalence closure as a block matrix along with its class partition
+    :param rows:
+    :param size:
+    :return: The closed rows and the list of classes
+    """
+    classes = equivalence_classes(rows, size)
+    closed_rows = [0] * size
+    for members in classes:
+        mask = 0
+        for element in members:
+            mask |= 1 << element
+        for element in members:
+            closed_rows[element] = mask
+    return closed_rows, classes
+
+
+def insert_into_transitive_closure(rows, size, row, col):
+    """
+    Updates a transitive relation for the insertion of (row, col): every ancestor of row, row included,
+    gains every descendant of col, col included. This costs one pass of row ORs instead of a full closure.
+    :param rows: The rows of a transitive relation
+    :param size:
+    :param row:
+    :param col:
+    :return: The rows of the transitive closure of the relation with (row, col) inserted
+    """
+    descendants = rows[col] | 1 << col
+    row_bit = 1 << row
+    updated_rows = list(rows)
+    for ancestor in range(size):
+        if ancestor == row or rows[ancestor] & row_bit:
+            updated_rows[ancestor] |= descendants
+    return updated_rows
+
+
+def is_implied_in_transitive_relation(rows, row, col):
+    """
+    Returns whether (row, col) would be put straight back by transitive closure if it were removed from a
+    transitive relation, i.e. whether some k other than row and col has both (row, k) and (k, col)
+    :param rows: The rows of a transitive relation
+    :param row:
+    :param col:
+    :return:
+    """
+    col_bit = 1 << col
+    for k in iterate_bits(rows[row] & ~col_bit & ~(1 << row)):
+        if rows[k] & col_bit:
+            return True
+    return False
@@ -0,0 +1,80 @@
+"""
+Boolean matrix product, powers and bounded reachability working on bitset rows, where bit j of rows[i] is the
+entry at (i, j)
+"""
+
+PRODUCT_BLOCK_BITS = 8  # Rows of the right operand are combined in blocks of this many, one per byte of a left row
+
+
+def boolean_product(left_rows, right_rows, size):
+    """
+    Computes the boolean matrix product: row i of the result is the OR of the right rows k for which bit k of
+    left row i is set. Sparse left operands OR those rows directly. Denser ones use the method of the four
+    Russians: the ORs of every subset of each block of 8 right rows are tabulated once, so that each byte of a
+    left row costs a single table lookup and OR.
+    :param left_rows:
+    :param right_rows:
+    :param size:
+    :return:
+    """
+    row_bytes = (size + 7) // 8
+    ones = sum(row.bit_count() for row in left_rows)
+    if ones <= size * (row_bytes + (1 << PRODUCT_BLOCK_BITS) // PRODUCT_BLOCK_BITS):
+        product = []
+        for row in left_rows:
+            result = 0
+            while row:
+                low_bit = row & -row
+                result |= right_rows[low_bit.bit_length() - 1]
+                row ^= low_bit
+            product.append(result)
+        return product
+    tables = []
+    for start in range(0, size, PRODUCT_BLOCK_BITS):
+        block = right_rows[start:start + PRODUCT_BLOCK_BITS]
+        table = [0] * (1 << len(block))
+        for mask in range(1, len(table)):
+            low_bit = mask & -mask
+            table[mask] = table[mask ^ low_bit] | block[low_bit.bit_length() - 1]
+        tables.append(table)
+    product = []
+    for row in left_rows:
+        result = 0
+        for table, block_bits in zip(tables, row.to_bytes(row_bytes, 'little')):
+            if block_bits:
+                result |= table[block_bits]
+        product.append(result)
+    return product
+
+
+def boolean_power(rows, size, exponent):
+    """
+    Computes the exponent-th boolean power by repeated squaring, in O(log exponent) products
+    :param rows:
+    :param size:
+    :param exponent: A non-negative integer; the 0th power is the identity
+    :return:
+    """
+    result = None  # The identity, left implicit to save one product
+    base = rows
+    while exponent:
+        if exponent & 1:
+            result = list(base) if result is None else boolean_product(result, base, size)
+        exponent >>= 1
+        if exponent:
+            base = boolean_product(base, base, size)
+    return [1 << i for i in range(size)] if result is None else result
+
+
+def reachability_within(rows, size, steps):
+    """
+    Computes which elements reach which others along paths of 1 to steps entries, as R(I + R)^(steps - 1)
+    :param rows:
+    :param size:
+    :param steps: A non-negative integer; within 0 steps nothing is reachable
+    :return:
+    """
+    if steps == 0:
+        return [0] * size
+    reflexive_rows = [row | 1 << i for i, row in enumerate(rows)]
+    return boolean_product(rows, boolean_power(reflexive_rows, size, steps - 1), size)
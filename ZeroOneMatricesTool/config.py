@@ -0,0 +1,22 @@
+import json
+import sys
+
+CONFIG_FILE_PATH = 'config.json'
+
+_loaded_config = None
+
+
+def load_config():
+    """
+    Reads config.json, only once per process
+    :return:
+    """
+    global _loaded_config
+    if _loaded_config is None:
+        try:
+            with open(CONFIG_FILE_PATH) as json_file:
+                _loaded_config = json.load(json_file)
+        except FileNotFoundError:
+            print('config.json not found.')
+            sys.exit(1)
+    return _loaded_config
@@ -1,6 +1,18 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey
+import math
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, LargeBinary, inspect, select, \
+    update, delete, text, func, Index, and_, or_
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, scoped_session
+from sqlalchemy.pool import StaticPool
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.cache import LRUCache, matrix_memory_size
+from ZeroOneMatricesTool.config import load_config
+
+DEFAULT_MATRIX_CACHE_BYTES = 32 * 1024 * 1024
 
 Persisted = declarative_base()
 
@@ -18,8 +30,22 @@ class Matrix(Persisted):
     user_id = Column(Integer, ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
     timestamp = Column(DateTime, nullable=False)
     name = Column(String(256), nullable=False)
+    size = Column(Integer)  # Null for matrices still stored one MatrixElement per cell
+    packed_elements = Column(LargeBinary(length=2 ** 32 - 1))  # Rows packed as by BooleanMatrix.to_bytes
     user = relationship('User', back_populates='matrices')
     matrix_elements = relationship('MatrixElement', back_populates='matrix')
+    __table_args__ = (
+        Index('ix_matrices_user_timestamp', 'user_id', 'timestamp'),
+        Index('ix_matrices_user_name', 'user_id', 'name'),
+    )
+
+
+class OperationResult(Persisted):
+    __tablename__ = 'operation_results'
+    input_digest = Column(String(64), primary_key=True)  # Content hash of the input, see operation_cache.matrix_digest
+    operation = Column(String(32), primary_key=True)
+    size = Column(Integer, nullable=False)
+    packed_elements = Column(LargeBinary(length=2 ** 32 - 1), nullable=False)  # Result packed as by to_bytes
 
 
 class MatrixElement(Persisted):
@@ -40,13 +66,205 @@ class MatrixDatabase(object):
     def construct_in_memory_url():
         return 'sqlite:///'
 
-    def __init__(self, url):
-        self.engine = create_engine(url)
-        self.Session = sessionmaker()
-        self.Session.configure(bind=self.engine)
+    def __init__(self, url, matrix_cache_bytes=DEFAULT_MATRIX_CACHE_BYTES, pool_size=5, max_overflow=10,
+                 pool_pre_ping=True, pool_recycle=3600):
+        if url == MatrixDatabase.construct_in_memory_url():
+            # Every connection to an in-memory database sees a different database, so share a single one
+            self.engine = create_engine(url, poolclass=StaticPool, connect_args={'check_same_thread': False})
+        elif url.startswith('sqlite'):
+            self.engine = create_engine(url, pool_pre_ping=pool_pre_ping)
+        else:
+            self.engine = create_engine(url, pool_size=pool_size, max_overflow=max_overflow,
+                                        pool_pre_ping=pool_pre_ping, pool_recycle=pool_recycle)
+        self.Session = scoped_session(sessionmaker(bind=self.engine))
+        self.matrix_cache = LRUCache(matrix_cache_bytes, matrix_memory_size)  # matrix_id -> BooleanMatrix
 
     def ensure_tables_exist(self):
         Persisted.metadata.create_all(self.engine)
+        for index in Matrix.__table__.indexes:  # create_all only adds indexes to tables it creates
+            index.create(self.engine, checkfirst=True)
 
     def create_session(self):
         return self.Session()
+
+    @contextmanager
+    def session_scope(self):
+        """
+        Provides the session for one unit of work, committing it on success and rolling it back on error.
+        The session is thread-local and returned to the registry when the unit of work ends.
+        :return:
+        """
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.Session.remove()
+
+    @staticmethod
+    def find_matrices_page(session, user_id, search_query, after_key, page_size):
+        """
+        Fetches one page of a user's saved matrices, newest first, whose names contain the search query.
+        Pages are found by keyset on (timestamp, matrix_id), so each page reads only page_size + 1 rows.
+        :param session:
+        :param user_id:
+        :param search_query:
+        :param after_key: The (timestamp, matrix_id) of the last matrix on the previous page, or None
+        :param page_size:
+        :return: The rows of the page, each with matrix_id, name and timestamp, and whether a next page exists
+        """
+        query = select(Matrix.matrix_id, Matrix.name, Matrix.timestamp).where(Matrix.user_id == user_id)
+        search_query = search_query.strip()
+        if search_query:
+            escaped_query = search_query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = query.where(Matrix.name.ilike(f'%{escaped_query}%', escape='\\'))
+        if after_key is not None:
+            after_timestamp, after_matrix_id = after_key
+            query = query.where(or_(Matrix.timestamp < after_timestamp,
+                                    and_(Matrix.timestamp == after_timestamp, Matrix.matrix_id < after_matrix_id)))
+        query = query.order_by(Matrix.timestamp.desc(), Matrix.matrix_id.desc()).limit(page_size + 1)
+        rows = session.execute(query).all()
+        return rows[:page_size], len(rows) > page_size
+
+    def save_matrix(self, session, user_id, name, matrix, timestamp):
+        """
+        Saves matrix in packed form with a single INSERT
+        :param session:
+        :param user_id:
+        :param name:
+        :param matrix:
+        :param timestamp:
+        :return: The id of the saved matrix
+        """
+        new_matrix = Matrix(user_id=user_id, timestamp=timestamp, name=name, size=matrix.size,
+                            packed_elements=matrix.to_bytes())
+        session.add(new_matrix)
+        session.flush()
+        self.matrix_cache.invalidate(new_matrix.matrix_id)
+        return new_matrix.matrix_id
+
+    def load_matrix(self, session, matrix_id):
+        """
+        Loads a saved matrix, decoding it straight from its packed column and caching the result
+        :param session:
+        :param matrix_id:
+        :return:
+        """
+        cached_matrix = self.matrix_cache.get(matrix_id)
+        if cached_matrix is not None:
+            return cached_matrix
+        matrices_table = Matrix.__table__
+        size, packed_elements = session.execute(
+            select(matrices_table.c.size, matrices_table.c.packed_elements).where(
+                matrices_table.c.matrix_id == matrix_id)).one()
+        if packed_elements is not None:
+            loaded_matrix = BooleanMatrix.from_bytes(size, packed_elements)
+        else:  # Saved before packed storage and not yet migrated
+            elements_table = MatrixElement.__table__
+            cell_count = session.scalar(
+                select(func.count()).select_from(elements_table).where(elements_table.c.matrix_id == matrix_id))
+            size = math.isqrt(cell_count)
+            rows = [0] * size
+            for row, col in session.execute(select(elements_table.c.row, elements_table.c.col).where(
+                    elements_table.c.matrix_id == matrix_id, elements_table.c.value == 1)):
+                rows[row] |= 1 << col
+            loaded_matrix = BooleanMatrix(size, rows)
+        self.matrix_cache.put(matrix_id, loaded_matrix)
+        return loaded_matrix
+
+    @staticmethod
+    def load_operation_result(session, input_digest, operation_name):
+        """
+        Loads the stored result of an operation on the matrix with the given content hash
+        :param session:
+        :param input_digest:
+        :param operation_name:
+        :return: The result matrix, or None if it has not been stored
+        """
+        results_table = OperationResult.__table__
+        stored_result = session.execute(
+            select(results_table.c.size, results_table.c.packed_elements).where(
+                results_table.c.input_digest == input_digest,
+                results_table.c.operation == operation_name)).one_or_none()
+        if stored_result is None:
+            return None
+        return BooleanMatrix.from_bytes(*stored_result)
+
+    @staticmethod
+    def save_operation_result(session, input_digest, operation_name, result):
+        """
+        Stores the result of an operation on the matrix with the given content hash, replacing any stored before
+        :param session:
+        :param input_digest:
+        :param operation_name:
+        :param result:
+        :return:
+        """
+        session.merge(OperationResult(input_digest=input_digest, operation=operation_name, size=result.size,
+                                      packed_elements=result.to_bytes()))
+
+    def migrate_matrix_elements(self):
+        """
+        Adds the packed storage columns to an existing matrices table and packs every matrix still stored
+        one MatrixElement per cell, deleting its element rows afterwards
+        :return: The number of matrices migrated
+        """
+        matrices_table = Matrix.__table__
+        elements_table = MatrixElement.__table__
+        existing_columns = {column['name'] for column in inspect(self.engine).get_columns('matrices')}
+        with self.engine.begin() as connection:
+            for column in (matrices_table.c.size, matrices_table.c.packed_elements):
+                if column.name not in existing_columns:
+                    column_ddl = CreateColumn(column).compile(dialect=self.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE matrices ADD COLUMN {column_ddl}'))
+        with self.engine.connect() as connection:
+            legacy_ids = connection.scalars(
+                select(matrices_table.c.matrix_id).where(matrices_table.c.packed_elements.is_(None))).all()
+        for matrix_id in legacy_ids:
+            with self.engine.begin() as connection:  # One transaction per matrix keeps each migration atomic
+                cells = connection.execute(
+                    select(elements_table.c.row, elements_table.c.col, elements_table.c.value).where(
+                        elements_table.c.matrix_id == matrix_id)).all()
+                size = math.isqrt(len(cells))
+                rows = [0] * size
+                for row, col, value in cells:
+                    if value:
+                        rows[row] |= 1 << col
+                connection.execute(update(matrices_table).where(matrices_table.c.matrix_id == matrix_id).values(
+                    size=size, packed_elements=BooleanMatrix(size, rows).to_bytes()))
+                connection.execute(delete(elements_table).where(elements_table.c.matrix_id == matrix_id))
+            self.matrix_cache.invalidate(matrix_id)
+        return len(legacy_ids)
+
+
+_shared_matrix_database = None
+
+
+def get_matrix_database():
+    """
+    Returns the process-wide MatrixDatabase, building its engine and connection pool from config.json on
+    first use
+    :return:
+    """
+    global _shared_matrix_database
+    if _shared_matrix_database is None:
+        database_config = load_config()['database']
+        if database_config.get('dialect', 'mysql') == 'sqlite':
+            url = MatrixDatabase.construct_in_memory_url()
+        else:
+            url = MatrixDatabase.construct_mysql_url(database_config['host'], int(database_config['port']),
+                                                     database_config['name'], database_config['user'],
+                                                     database_config['password'])
+        pool_config = database_config.get('pool', {})
+        matrix_cache_bytes = int(load_config().get('cache', {}).get('max_bytes', DEFAULT_MATRIX_CACHE_BYTES))
+        _shared_matrix_database = MatrixDatabase(url, matrix_cache_bytes,
+                                                 pool_size=int(pool_config.get('size', 5)),
+                                                 max_overflow=int(pool_config.get('max_overflow', 10)),
+                                                 pool_pre_ping=bool(pool_config.get('pre_ping', True)),
+                                                 pool_recycle=int(pool_config.get('recycle', 3600)))
+        if url == MatrixDatabase.construct_in_memory_url():
+            _shared_matrix_database.ensure_tables_exist()
+    return _shared_matrix_database
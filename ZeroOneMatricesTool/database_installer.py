@@ -2,16 +2,17 @@ from sys import stderr
 
 from sqlalchemy.exc import SQLAlchemyError
 
-from ZeroOneMatricesTool.database import MatrixDatabase
-from config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
+from ZeroOneMatricesTool.database import get_matrix_database
 
 
 def main():
     try:
-        url = MatrixDatabase.construct_mysql_url(DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD)
-        matrix_database = MatrixDatabase(url)
+        matrix_database = get_matrix_database()
         matrix_database.ensure_tables_exist()
         print('Tables created.')
+        migrated_count = matrix_database.migrate_matrix_elements()
+        if migrated_count:
+            print(f'{migrated_count} matrices migrated to packed storage.')
     except SQLAlchemyError as exception:
         print('Database setup failed!', file=stderr)
         print(f'Cause: {exception}', file=stderr)
@@ -0,0 +1,240 @@
+"""
+Enumeration and counting of every size x size 0-1 matrix having a chosen set of properties.
+
+The search decides one entry at a time. After each decision, constraint propagation forces every entry the
+properties imply, so dead ends are abandoned as early as possible:
+
+- reflexive and irreflexive fix the diagonal before the search starts
+- symmetric copies each decided entry to its mirror, so only one of each mirrored pair is ever branched on
+- anti_symmetric clears the mirror of each 1 off the diagonal
+- transitive adds row j to row i whenever (i, j) is 1, and clears (j, k) whenever (i, j) is 1 and (i, k) is 0
+
+Every complete matrix is checked once more with BooleanMatrix.has_property, the same checks the editor uses.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations, product
+
+from ZeroOneMatricesTool.boolean_matrix import ANTI_SYMMETRIC, ASYMMETRIC, BooleanMatrix, EQUIVALENCE, \
+    IRREFLEXIVE, REFLEXIVE, SYMMETRIC, TRANSITIVE
+from ZeroOneMatricesTool.closure import iterate_bits
+from ZeroOneMatricesTool.pipeline import GUARANTEES
+
+PROPERTY_FLAGS = GUARANTEES  # Property name (as used by the operations) -> fingerprint bit
+
+
+def parse_property_names(text):
+    """
+    Converts a comma separated list of property names to fingerprint bits
+    :param text:
+    :return:
+    """
+    properties = 0
+    for name in (name.strip() for name in text.split(',')):
+        if not name:
+            continue
+        if name not in PROPERTY_FLAGS:
+            raise ValueError(f'Unknown property: {name} (expected one of {", ".join(PROPERTY_FLAGS)})')
+        properties |= PROPERTY_FLAGS[name]
+    return properties
+
+
+def _constraint_flags(properties):
+    """
+    Expands the compound properties into the ones propagation works with
+    :param properties:
+    :return:
+    """
+    if properties & EQUIVALENCE:
+        properties |= REFLEXIVE | SYMMETRIC | TRANSITIVE
+    if properties & ASYMMETRIC:
+        properties |= IRREFLEXIVE | ANTI_SYMMETRIC
+    return properties
+
+
+def _column(masks, index):
+    column = 0
+    for i, mask in enumerate(masks):
+        if mask >> index & 1:
+            column |= 1 << i
+    return column
+
+
+def _propagate(size, flags, ones, zeros):
+    """
+    Forces, in place, every entry implied by the decided ones and zeros until nothing changes
+    :param size:
+    :param flags:
+    :param ones: Per row, the entries decided to be 1
+    :param zeros: Per row, the entries decided to be 0
+    :return: False if the decided entries contradict the properties
+    """
+    changed = True
+    while changed:
+        changed = False
+        for i in range(size):
+            row_ones, row_zeros = ones[i], zeros[i]
+            if flags & SYMMETRIC:
+                row_ones |= _column(ones, i)
+                row_zeros |= _column(zeros, i)
+            if flags & ANTI_SYMMETRIC:
+                row_zeros |= _column(ones, i) & ~(1 << i)
+            if flags & TRANSITIVE:
+                for j in iterate_bits(row_ones):
+                    row_ones |= ones[j]
+                    if zeros[i] & ~zeros[j]:  # (i, j) = 1 and (i, k) = 0 force (j, k) = 0
+                        zeros[j] |= zeros[i]
+                        changed = True
+                for j in range(size):
+                    if ones[j] & row_zeros:  # (j, k) = 1 and (i, k) = 0 force (i, j) = 0
+                        row_zeros |= 1 << j
+            if row_ones & row_zeros:
+                return False
+            if row_ones != ones[i] or row_zeros != zeros[i]:
+                ones[i], zeros[i] = row_ones, row_zeros
+                changed = True
+    return all(not ones[i] & zeros[i] for i in range(size))
+
+
+def _initial_state(size, flags):
+    ones = [0] * size
+    zeros = [0] * size
+    for i in range(size):
+        if flags & REFLEXIVE:
+            ones[i] |= 1 << i
+        if flags & IRREFLEXIVE:
+            zeros[i] |= 1 << i
+    if not _propagate(size, flags, ones, zeros):
+        return None
+    return ones, zeros
+
+
+def _branches(size, flags, ones, zeros):
+    """
+    Decides the first undecided entry both ways
+    :return: The consistent child states, or None if every entry is decided
+    """
+    full_row = (1 << size) - 1
+    for i in range(size):
+        undecided = full_row & ~(ones[i] | zeros[i])
+        if undecided:
+            bit = undecided & -undecided
+            children = []
+            for value in (0, 1):
+                child_ones, child_zeros = list(ones), list(zeros)
+                if value:
+                    child_ones[i] |= bit
+                else:
+                    child_zeros[i] |= bit
+                if _propagate(size, flags, child_ones, child_zeros):
+                    children.append((child_ones, child_zeros))
+            return children
+    return None
+
+
+def _search(size, flags, properties, ones, zeros, up_to_isomorphism):
+    """
+    Yields the rows of every matrix completing a state
+    """
+    stack = [(ones, zeros)]
+    while stack:
+        ones, zeros = stack.pop()
+        children = _branches(size, flags, ones, zeros)
+        if children is None:
+            matrix = BooleanMatrix(size, ones)
+            if all(matrix.has_property(flag) for flag in iterate_flags(properties)) and \
+                    (not up_to_isomorphism or is_canonical(ones, size)):
+                yield ones
+        else:
+            stack.extend(reversed(children))
+
+
+def iterate_flags(properties):
+    for position in iterate_bits(properties):
+        yield 1 << position
+
+
+def is_canonical(rows, size):
+    """
+    Returns whether rows is the chosen representative of its isomorphism class: its elements are ordered by
+    (out-degree, in-degree, self loop), and no relabelling that keeps that order gives lexicographically
+    smaller rows. Only relabellings within groups of elements with equal invariants are tried.
+    :param rows:
+    :param size:
+    :return:
+    """
+    invariants = [(rows[v].bit_count(), _column(rows, v).bit_count(), rows[v] >> v & 1) for v in range(size)]
+    if any(invariants[v] > invariants[v + 1] for v in range(size - 1)):
+        return False
+    groups = []
+    start = 0
+    for v in range(1, size + 1):
+        if v == size or invariants[v] != invariants[start]:
+            groups.append(range(start, v))
+            start = v
+    original = tuple(rows)
+    for group_orders in product(*(permutations(group) for group in groups)):
+        relabel = [label for order in group_orders for label in order]
+        relabelled = [0] * size
+        for v, row in enumerate(rows):
+            mapped_row = 0
+            for u in iterate_bits(row):
+                mapped_row |= 1 << relabel[u]
+            relabelled[relabel[v]] = mapped_row
+        if tuple(relabelled) < original:
+            return False
+    return True
+
+
+def enumerate_relations(size, properties, up_to_isomorphism=False):
+    """
+    Yields every size x size matrix having all the given properties, lazily
+    :param size:
+    :param properties: Fingerprint bits, e.g. REFLEXIVE | TRANSITIVE
+    :param up_to_isomorphism: Whether to yield one matrix per isomorphism class only
+    :return:
+    """
+    flags = _constraint_flags(properties)
+    state = _initial_state(size, flags)
+    if state is None:
+        return
+    for rows in _search(size, flags, properties, *state, up_to_isomorphism):
+        yield BooleanMatrix(size, rows)
+
+
+def _count_subtree(size, flags, properties, ones, zeros, up_to_isomorphism):
+    return sum(1 for _ in _search(size, flags, properties, ones, zeros, up_to_isomorphism))
+
+
+def count_relations(size, properties, up_to_isomorphism=False, workers=None):
+    """
+    Counts the size x size matrices having all the given properties, splitting the search tree between
+    worker processes
+    :param size:
+    :param properties:
+    :param up_to_isomorphism:
+    :param workers: Number of worker processes, defaulting to the number of CPUs; 1 counts in this process
+    :return:
+    """
+    workers = workers or os.cpu_count() or 1
+    flags = _constraint_flags(properties)
+    state = _initial_state(size, flags)
+    if state is None:
+        return 0
+    if workers == 1:
+        return _count_subtree(size, flags, properties, *state, up_to_isomorphism)
+    frontier = [state]
+    complete = []
+    while frontier and len(frontier) < 8 * workers:  # Split until every worker has several subtrees
+        next_frontier = []
+        for ones, zeros in frontier:
+            children = _branches(size, flags, ones, zeros)
+            if children is None:
+                complete.append((ones, zeros))
+            else:
+                next_frontier.extend(children)
+        frontier = next_frontier
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_count_subtree, size, flags, properties, ones, zeros, up_to_isomorphism)
+                   for ones, zeros in frontier + complete]
+        return sum(future.result() for future in futures)
@@ -0,0 +1,121 @@
+import sys
+from collections import deque
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+INT_OVERHEAD_BYTES = sys.getsizeof(0)
+
+
+class MatrixStep(object):
+    """
+    One step of the editing history, holding only the rows the step changed
+    """
+
+    __slots__ = ('changed_rows', 'before_properties', 'after_properties', 'size_bytes')
+
+    def __init__(self, changed_rows, before_properties, after_properties):
+        self.changed_rows = changed_rows  # row index -> (row before, row after)
+        self.before_properties = before_properties  # (checked, holding) fingerprint bits before the step
+        self.after_properties = after_properties  # (checked, holding) fingerprint bits after the step
+        self.size_bytes = sum(2 * INT_OVERHEAD_BYTES + (before.bit_length() + after.bit_length()) // 8
+                              for before, after in changed_rows.values())
+
+
+def _apply(matrix, step, forward):
+    rows = list(matrix.rows)
+    for index, (before, after) in step.changed_rows.items():
+        rows[index] = after if forward else before
+    updated_matrix = BooleanMatrix(matrix.size, rows)
+    updated_matrix.checked_properties, updated_matrix.properties = (
+        step.after_properties if forward else step.before_properties)
+    return updated_matrix
+
+
+class MatrixHistory(object):
+    """
+    Undo/redo history of the matrix editor.
+
+    The current matrix is always materialized and acts as the snapshot every step is applied against. Each
+    step stores the changed rows both before and after it, so undo and redo touch only what changed and
+    never replay the history from the start. When the steps exceed max_bytes the oldest are forgotten, but the
+    most recent step is always kept, even on its own larger than max_bytes, so the last change can be undone.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current = None
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.size_bytes = 0
+
+    def __len__(self):
+        """
+        Returns the number of states reachable by undo, including the current one
+        :return:
+        """
+        return 0 if self.current is None else len(self.undo_steps) + 1
+
+    def reset(self, matrix):
+        """
+        Discards the history and starts a new one at matrix
+        :param matrix:
+        :return:
+        """
+        self.current = matrix
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.size_bytes = 0
+
+    def push(self, matrix):
+        """
+        Records matrix as the new current state, clearing any steps that could be redone
+        :param matrix:
+        :return:
+        """
+        if matrix.size != self.current.size:
+            raise ValueError('Cannot record a matrix of a different size in the same history')
+        changed_rows = {index: (before, after) for index, (before, after) in
+                        enumerate(zip(self.current.rows, matrix.rows)) if before != after}
+        step = MatrixStep(changed_rows, (self.current.checked_properties, self.current.properties),
+                          (matrix.checked_properties, matrix.properties))
+        self.size_bytes -= sum(redo_step.size_bytes for redo_step in self.redo_steps)
+        self.redo_steps.clear()
+        self.undo_steps.append(step)
+        self.size_bytes += step.size_bytes
+        self.current = matrix
+        self._evict()
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def undo(self):
+        """
+        Steps back to the previous state
+        :return: Whether there was a step to undo
+        """
+        if not self.undo_steps:
+            return False
+        step = self.undo_steps.pop()
+        self.current = _apply(self.current, step, forward=False)
+        self.redo_steps.append(step)
+        return True
+
+    def redo(self):
+        """
+        Steps forward to the most recently undone state
+        :return: Whether there was a step to redo
+        """
+        if not self.redo_steps:
+            return False
+        step = self.redo_steps.pop()
+        self.current = _apply(self.current, step, forward=True)
+        self.undo_steps.append(step)
+        return True
+
+    def _evict(self):
+        while self.size_bytes > self.max_bytes and len(self.undo_steps) > 1:
+            self.size_bytes -= self.undo_steps.popleft().size_bytes
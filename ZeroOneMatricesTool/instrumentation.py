@@ -0,0 +1,202 @@
+"""
+Optional timing of the hot paths: property operations, database queries and grid redraws.
+
+Code under measurement wraps itself in instrumentation.measure(kind, name, cells). While instrumentation is
+disabled that returns a shared no-op context manager, so the only cost is one attribute check. While it is
+enabled each measurement records its wall time, the number of matrix cells involved, the bytes allocated
+(when allocation tracing is on) and the screen that was showing, and can be exported as a JSON lines log or
+as a Chrome trace file viewable in chrome://tracing or Perfetto.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+DEFAULT_MAX_MEASUREMENTS = 10000
+
+_DISABLED = nullcontext()
+
+
+class Measurement(object):
+    """
+    One timed call
+    """
+
+    __slots__ = ('kind', 'name', 'screen', 'start', 'seconds', 'cells', 'allocated_bytes', 'thread')
+
+    def __init__(self, kind, name, screen, start, seconds, cells, allocated_bytes, thread):
+        self.kind = kind  # 'operation', 'query' or 'render'
+        self.name = name
+        self.screen = screen
+        self.start = start  # time.perf_counter() at the start of the call
+        self.seconds = seconds
+        self.cells = cells
+        self.allocated_bytes = allocated_bytes  # Peak bytes allocated during the call, None unless traced
+        self.thread = thread
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class Instrumentation(object):
+    """
+    Collects measurements, keeping only the most recent max_measurements
+    """
+
+    def __init__(self, max_measurements=DEFAULT_MAX_MEASUREMENTS):
+        self.enabled = False
+        self.trace_allocations = False
+        self.current_screen = None
+        self.measurements = deque(maxlen=max_measurements)
+        self.lock = threading.Lock()
+
+    def enable(self, trace_allocations=False):
+        """
+        Starts recording measurements
+        :param trace_allocations: Whether to also record allocations, which slows Python down considerably
+        :return:
+        """
+        self.trace_allocations = trace_allocations
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.trace_allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_allocations = False
+
+    def clear(self):
+        with self.lock:
+            self.measurements.clear()
+
+    def measure(self, kind, name, cells=0):
+        """
+        Returns a context manager timing the code it wraps
+        :param kind:
+        :param name:
+        :param cells: Number of matrix cells the code works on
+        :return:
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self._measure(kind, name, cells)
+
+    @contextmanager
+    def _measure(self, kind, name, cells):
+        screen = self.current_screen
+        trace_allocations = self.trace_allocations and tracemalloc.is_tracing()
+        if trace_allocations:
+            tracemalloc.reset_peak()
+            allocated_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            allocated_bytes = tracemalloc.get_traced_memory()[1] - allocated_before if trace_allocations else None
+            self.record(Measurement(kind, name, screen, start, seconds, cells, allocated_bytes,
+                                    threading.current_thread().name))
+
+    def record(self, measurement):
+        with self.lock:
+            self.measurements.append(measurement)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.measurements)
+
+    def hook_engine(self, engine):
+        """
+        Records every statement the SQLAlchemy engine executes as a 'query' measurement, with the number of
+        rows it affected as its cell count
+        :param engine:
+        :return:
+        """
+        from sqlalchemy import event  # Only imported by callers that already use SQLAlchemy
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+            if self.enabled:
+                connection.info['instrumentation_start'] = (time.perf_counter(), self.current_screen)
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+            started = connection.info.pop('instrumentation_start', None)
+            if started is not None:
+                start, screen = started
+                self.record(Measurement('query', statement.split(None, 1)[0].upper(), screen, start,
+                                        time.perf_counter() - start, max(cursor.rowcount, 0), None,
+                                        threading.current_thread().name))
+
+    def query_totals(self):
+        """
+        Totals the database queries made while each screen was showing
+        :return: screen -> (query count, total seconds)
+        """
+        totals = {}
+        for measurement in self.snapshot():
+            if measurement.kind == 'query':
+                count, seconds = totals.get(measurement.screen, (0, 0.0))
+                totals[measurement.screen] = (count + 1, seconds + measurement.seconds)
+        return totals
+
+    def summary(self, recent=5):
+        """
+        Describes the most recent operations and redraws and the query totals per screen, one per line
+        :param recent: Number of recent measurements of each kind to describe
+        :return:
+        """
+        measurements = self.snapshot()
+        lines = []
+        for kind in ('operation', 'render'):
+            for measurement in [entry for entry in measurements if entry.kind == kind][-recent:]:
+                line = f'{measurement.name}: {measurement.seconds * 1000:.1f} ms, {measurement.cells} cells'
+                if measurement.allocated_bytes is not None:
+                    line += f', {measurement.allocated_bytes / 1024:.0f} KiB'
+                lines.append(line)
+        for screen, (count, seconds) in self.query_totals().items():
+            lines.append(f'{screen}: {count} queries, {seconds * 1000:.1f} ms')
+        return '\n'.join(lines)
+
+    def write_log(self, stream):
+        """
+        Writes every measurement as one JSON object per line
+        :param stream:
+        :return:
+        """
+        for measurement in self.snapshot():
+            stream.write(json.dumps(measurement.to_dict()))
+            stream.write('\n')
+
+    def write_trace(self, stream):
+        """
+        Writes every measurement as a complete event in the Chrome trace event format, with one track per thread
+        :param stream:
+        :return:
+        """
+        measurements = self.snapshot()
+        thread_ids = {}
+        for measurement in measurements:
+            thread_ids.setdefault(measurement.thread, len(thread_ids))
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': thread_id, 'args': {'name': thread}}
+                  for thread, thread_id in thread_ids.items()]
+        events.extend({
+            'name': measurement.name,
+            'cat': measurement.kind,
+            'ph': 'X',
+            'ts': measurement.start * 1e6,
+            'dur': measurement.seconds * 1e6,
+            'pid': os.getpid(),
+            'tid': thread_ids[measurement.thread],
+            'args': {'screen': measurement.screen, 'cells': measurement.cells,
+                     'allocated_bytes': measurement.allocated_bytes},
+        } for measurement in measurements)
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, stream)
+
+
+instrumentation = Instrumentation()  # Shared by the whole process
@@ -0,0 +1,244 @@
+"""
+Streaming export and import of every matrix a user has saved, for backups and for moving a library between
+databases, e.g.
+
+    python -m ZeroOneMatricesTool.cli export --user alice -o alice.zoml
+    python -m ZeroOneMatricesTool.cli import --user alice -i alice.zoml --url sqlite:///copy.db
+
+A library file is JSON lines: a header line, then one line per matrix holding its name, timestamp, size and
+rows packed as by BooleanMatrix.to_bytes, in base64. Export reads the matrices through a server-side cursor
+and import writes them back in batches, one transaction per batch, so memory stays bounded by the batch size
+and the largest matrix however big the library is.
+"""
+import base64
+import json
+import math
+import time
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import func, insert, select
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.database import Matrix, MatrixElement, User
+
+LIBRARY_FORMAT = 'zero-one-matrix-library'
+LIBRARY_VERSION = 1
+DEFAULT_BATCH_SIZE = 500
+EXISTING_NAME_POLICIES = ('skip', 'rename', 'fail')  # What import does with a name the user already has
+
+
+class TransferProgress(object):
+    """
+    Counts the matrices and bytes transferred so far, for reporting progress and throughput
+    """
+
+    def __init__(self, total=None):
+        self.total = total  # Number of matrices to transfer, None when unknown
+        self.matrices = 0
+        self.skipped = 0  # Matrices not imported because the user already has a matrix of that name
+        self.renamed = 0  # Matrices imported under a new name because the user already has one of theirs
+        self.bytes = 0
+        self.start = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.start
+
+    def describe(self):
+        seconds = max(self.seconds, 1e-9)
+        count = f'{self.matrices}/{self.total}' if self.total is not None else f'{self.matrices}'
+        description = (f'{count} matrices, {self.matrices / seconds:.0f} matrices/s, '
+                       f'{self.bytes / seconds / 1e6:.2f} MB/s')
+        if self.skipped:
+            description += f', {self.skipped} skipped'
+        if self.renamed:
+            description += f', {self.renamed} renamed'
+        return description
+
+
+def find_user_id(connection, username, create=False):
+    """
+    Returns the id of the (first created) user with the given name
+    :param connection:
+    :param username:
+    :param create: Whether to create the user if there is none, instead of raising ValueError
+    :return:
+    """
+    users_table = User.__table__
+    user_id = connection.scalar(select(func.min(users_table.c.user_id)).where(users_table.c.username == username))
+    if user_id is None:
+        if not create:
+            raise ValueError(f'There is no user named {username}')
+        user_id = connection.execute(insert(users_table).values(username=username)).inserted_primary_key[0]
+    return user_id
+
+
+def iterate_user_matrices(connection, user_id, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Streams a user's saved matrices in order of matrix_id. Matrices and their MatrixElement rows are read by one
+    query ordered by (matrix_id, row, col) through a server-side cursor fetching batch_size rows at a time.
+    Packed matrices have no element rows; the matrices saved before packed storage are rebuilt from theirs.
+    :param connection:
+    :param user_id:
+    :param batch_size:
+    :return: Yields (name, timestamp, BooleanMatrix)
+    """
+    matrices_table = Matrix.__table__
+    elements_table = MatrixElement.__table__
+    query = select(matrices_table.c.matrix_id, matrices_table.c.name, matrices_table.c.timestamp,
+                   matrices_table.c.size, matrices_table.c.packed_elements, elements_table.c.row,
+                   elements_table.c.col, elements_table.c.value).select_from(
+        matrices_table.outerjoin(elements_table, elements_table.c.matrix_id == matrices_table.c.matrix_id)).where(
+        matrices_table.c.user_id == user_id).order_by(
+        matrices_table.c.matrix_id, elements_table.c.row, elements_table.c.col)
+    result = connection.execution_options(yield_per=batch_size).execute(query)
+    for _, matrix_rows in groupby(result, key=lambda result_row: result_row.matrix_id):
+        first = next(matrix_rows)
+        if first.packed_elements is not None:
+            yield first.name, first.timestamp, BooleanMatrix.from_bytes(first.size, first.packed_elements)
+            continue
+        cells = [first]
+        cells.extend(matrix_rows)  # The element rows of a single matrix, which must be counted to know its size
+        size = math.isqrt(len(cells)) if first.row is not None else 0
+        rows = [0] * size
+        for cell in cells:
+            if cell.value:
+                rows[cell.row] |= 1 << cell.col
+        yield first.name, first.timestamp, BooleanMatrix(size, rows)
+
+
+def export_library(matrix_database, username, stream, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Writes every matrix a user has saved to a text stream as a library file
+    :param matrix_database:
+    :param username:
+    :param stream:
+    :param batch_size: Number of rows the database cursor fetches at a time
+    :param progress: Called with the TransferProgress after each batch_size matrices and at the end
+    :return: The TransferProgress
+    """
+    with matrix_database.engine.connect() as connection:
+        user_id = find_user_id(connection, username)
+        matrices_table = Matrix.__table__
+        transfer = TransferProgress(connection.scalar(
+            select(func.count()).select_from(matrices_table).where(matrices_table.c.user_id == user_id)))
+        stream.write(json.dumps({'format': LIBRARY_FORMAT, 'version': LIBRARY_VERSION, 'username': username}))
+        stream.write('\n')
+        for name, timestamp, matrix in iterate_user_matrices(connection, user_id, batch_size):
+            line = json.dumps({'name': name, 'timestamp': timestamp.isoformat(), 'size': matrix.size,
+                               'packed_elements': base64.b64encode(matrix.to_bytes()).decode('ascii')})
+            stream.write(line)
+            stream.write('\n')
+            transfer.matrices += 1
+            transfer.bytes += len(line) + 1
+            if progress is not None and transfer.matrices % batch_size == 0:
+                progress(transfer)
+    if progress is not None:
+        progress(transfer)
+    return transfer
+
+
+def read_library(stream):
+    """
+    Reads the header of a library file, leaving its matrices to be read lazily
+    :param stream:
+    :return: The header, and an iterator yielding (name, timestamp, size, packed_elements, line length) for
+    each matrix
+    """
+    header = json.loads(stream.readline() or 'null')
+    if not isinstance(header, dict) or header.get('format') != LIBRARY_FORMAT:
+        raise ValueError('Not a matrix library file')
+    if header.get('version') != LIBRARY_VERSION:
+        raise ValueError(f'Unsupported matrix library version: {header.get("version")}')
+    return header, _read_library_entries(stream)
+
+
+def _read_library_entries(stream):
+    for line_number, line in enumerate(stream, 2):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            size = int(entry['size'])
+            packed_elements = base64.b64decode(entry['packed_elements'], validate=True)
+            if size < 0 or len(packed_elements) != size * ((size + 7) // 8):
+                raise ValueError('the packed rows do not match the size')
+            yield entry['name'], datetime.fromisoformat(entry['timestamp']), size, packed_elements, len(line)
+        except (KeyError, TypeError, ValueError) as exception:
+            raise ValueError(f'Invalid matrix on line {line_number}: {exception}') from exception
+
+
+def import_library(matrix_database, stream, username=None, batch_size=DEFAULT_BATCH_SIZE, progress=None,
+                   on_existing='skip'):
+    """
+    Adds every matrix in a library file to a user's saved matrices, creating the user if needed. Matrices are
+    inserted batch_size at a time, each batch in its own transaction, so an error leaves the batches before it
+    imported. As when saving from the editor, a user's matrix names are kept unique.
+    :param matrix_database:
+    :param stream:
+    :param username: The user to import into, by default the user the library was exported from
+    :param batch_size:
+    :param progress: Called with the TransferProgress after each batch
+    :param on_existing: For a matrix whose name the user already has: 'skip' it, 'rename' it by appending
+    " (2)", " (3)"... to its name, or 'fail' by raising ValueError
+    :return: The TransferProgress
+    """
+    if on_existing not in EXISTING_NAME_POLICIES:
+        raise ValueError(f'Unknown policy for existing names: {on_existing}')
+    header, entries = read_library(stream)
+    username = username or header.get('username')
+    if not username:
+        raise ValueError('The library does not name a user, so one must be given')
+    with matrix_database.engine.begin() as connection:
+        user_id = find_user_id(connection, username, create=True)
+    transfer = TransferProgress()
+    batch = []
+    for name, timestamp, size, packed_elements, line_length in entries:
+        batch.append({'user_id': user_id, 'name': name, 'timestamp': timestamp, 'size': size,
+                      'packed_elements': packed_elements})
+        transfer.bytes += line_length
+        if len(batch) == batch_size:
+            _insert_batch(matrix_database, user_id, batch, on_existing, transfer, progress)
+    if batch:
+        _insert_batch(matrix_database, user_id, batch, on_existing, transfer, progress)
+    return transfer
+
+
+def _insert_batch(matrix_database, user_id, batch, on_existing, transfer, progress):
+    """
+    Inserts one batch of matrices in a single transaction, first resolving the names the user already has
+    """
+    matrices_table = Matrix.__table__
+    with matrix_database.engine.begin() as connection:
+        taken_names = set(connection.scalars(select(matrices_table.c.name).where(
+            matrices_table.c.user_id == user_id, matrices_table.c.name.in_([row['name'] for row in batch]))))
+        rows = []
+        for row in batch:
+            if row['name'] in taken_names:
+                if on_existing == 'fail':
+                    raise ValueError(f'A matrix named {row["name"]} already exists')
+                if on_existing == 'skip':
+                    transfer.skipped += 1
+                    continue
+                row['name'] = _unused_name(connection, user_id, row['name'], taken_names)
+                transfer.renamed += 1
+            taken_names.add(row['name'])
+            rows.append(row)
+        if rows:
+            connection.execute(insert(matrices_table), rows)
+    transfer.matrices += len(rows)
+    batch.clear()
+    if progress is not None:
+        progress(transfer)
+
+
+def _unused_name(connection, user_id, name, taken_names):
+    matrices_table = Matrix.__table__
+    number = 2
+    while True:
+        candidate = f'{name} ({number})'
+        if candidate not in taken_names and connection.scalar(select(func.count()).select_from(matrices_table).where(
+                matrices_table.c.user_id == user_id, matrices_table.c.name == candidate)) == 0:
+            return candidate
+        number += 1
@@ -1,11 +1,8 @@
-import math
-import re
-import sys
 from datetime import datetime
-import json
 
 from kivy.app import App
-from kivy.properties import StringProperty
+from kivy.clock import Clock
+from kivy.properties import BooleanProperty, NumericProperty, StringProperty
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.dropdown import DropDown
 from kivy.uix.label import Label
@@ -14,8 +11,22 @@ from kivy.uix.screenmanager import ScreenManager, Screen, NoTransition
 from kivy.uix.spinner import Spinner
 from kivy.uix.textinput import TextInput
 from kivy.uix.widget import Widget
-
-from ZeroOneMatricesTool.database import MatrixDatabase, User, Matrix, MatrixElement
+from sqlalchemy import select
+
+from ZeroOneMatricesTool.background import BackgroundWorker
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.config import load_config
+from ZeroOneMatricesTool.database import User, Matrix, get_matrix_database
+from ZeroOneMatricesTool.history import DEFAULT_MAX_BYTES, MatrixHistory
+from ZeroOneMatricesTool.instrumentation import instrumentation
+from ZeroOneMatricesTool.matrix_grid import MatrixGrid  # noqa: F401 - registers MatrixGrid for the kv rules
+from ZeroOneMatricesTool.operation_cache import DEFAULT_MAX_BYTES as DEFAULT_OPERATION_CACHE_BYTES, \
+    OperationCache
+from ZeroOneMatricesTool.operations import OPERATIONS, parse_operation_names
+from ZeroOneMatricesTool.pipeline import run_pipeline
+
+LOAD_MATRIX_PAGE_SIZE = 5
+MAX_MATRIX_SIZE = 500
 
 '''
 Custom Kivy Screen Classes
@@ -27,12 +38,15 @@ class HomeScreen(Screen):
 
 
 class EnterMatrixScreen(Screen):
-    entered_matrix = {}  # Stores the matrix the user enters
+    entered_matrix = None  # Stores the BooleanMatrix the user enters
 
 
 class LoadMatrixScreen(Screen):
-    saved_matrices = []  # Saves a list of saved matrices
-    display_index = 0  # Stores the index of the first element currently shown in the load matrix list
+    saved_matrices = []  # Stores the page of saved matrices currently shown
+    search_query = ''  # Stores the search query the list is filtered by
+    page_keys = [None]  # Stores the (timestamp, matrix_id) key each visited page starts after, None for the first
+    has_next_page = False  # Stores whether there are more matrices after the current page
+    compose = False  # Stores whether picking a matrix composes the editor's matrix with it rather than opening it
 
 
 class MatrixEditorScreen(Screen):
@@ -43,25 +57,6 @@ class SaveMatrixScreen(Screen):
     pass
 
 
-def build_matrix_database():
-    file_path = 'config.json'
-    try:
-        with open(file_path) as json_file:
-            data = json.load(json_file)
-            database_host = data["database"]["host"]
-            database_port = data["database"]["port"]
-            database_name = data["database"]["name"]
-            database_user = data["database"]["user"]
-            database_password = data["database"]["password"]
-    except FileNotFoundError:
-        print('config.json not found.')
-        sys.exit(1)
-    url = MatrixDatabase.construct_mysql_url(database_host, int(database_port), database_name, database_user,
-                                             database_password)
-    matrix_database = MatrixDatabase(url)
-    return matrix_database
-
-
 class SelectUserScreen(Screen):
     def on_pre_enter(self):  # Runs on enter the screen
         self.populate_select_user_spinner()
@@ -70,12 +65,8 @@ class SelectUserScreen(Screen):
         """
         Populates the select user spinner with each username in the database
         """
-        matrix_database = build_matrix_database()
-        screen_database_session = matrix_database.create_session()
-        users = screen_database_session.query(User).all()
-        screen_database_session.close()
-        self.ids.user_select_spinner.values = [user.username for user in
-                                               users]
+        with get_matrix_database().session_scope() as session:
+            self.ids.user_select_spinner.values = list(session.scalars(select(User.username)))
 
 
 class CreateUserScreen(Screen):
@@ -95,29 +86,25 @@ class SelfFormattingText(Label):
     pass
 
 
-class ZeroOneTextInput(TextInput):
-    pat = re.compile('[^01]')
-
-    def insert_text(self, substring, from_undo=False):
-        s = re.sub(self.pat, '', substring)
-
-        if not self.text and s:
-            return super().insert_text(s[0], from_undo=from_undo)
-        return
-
-
 class MatrixSizeTextInput(TextInput):
     def insert_text(self, substring, from_undo=False):
         new_text = self.text[:self.cursor_index()] + substring + self.text[
                                                                  self.cursor_index():]
         if not new_text.isdigit():
             return
-        if not (1 <= int(new_text) <= 20):
+        if not (1 <= int(new_text) <= MAX_MATRIX_SIZE):
             return
 
         return super().insert_text(substring, from_undo=from_undo)
 
 
+class StepCountTextInput(TextInput):
+    def insert_text(self, substring, from_undo=False):
+        if not substring.isdigit():
+            return
+        return super().insert_text(substring, from_undo=from_undo)
+
+
 class NameTextInput(TextInput):
     def insert_text(self, substring, from_undo=False):
         s = "".join([c for c in substring if c != ' ' and c != '\t'])
@@ -148,14 +135,30 @@ Define kivy app class
 
 
 class ZeroOneMatricesTool(App):
+    busy = BooleanProperty(False)  # Whether a background task is running, disabling the buttons that conflict with it
+    cancellable = BooleanProperty(False)  # Whether the running background task can be cancelled
+    progress = NumericProperty(0)  # Percentage done of the running background task
+    status_text = StringProperty('')  # Describes the running background task
+    overlay_visible = BooleanProperty(False)  # Whether the performance overlay is shown in the matrix editor
+    overlay_text = StringProperty('')  # Summary of the latest measurements shown in the performance overlay
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.matrix_database = build_matrix_database()
-        self.database_session = self.matrix_database.create_session()
+        self.matrix_database = get_matrix_database()
+        self.background_worker = BackgroundWorker()
+        self.running_task = None
         self.screen_manager = ScreenManager(transition=NoTransition())
-        self.matrices_stack = []
+        history_config = load_config().get('history', {})
+        self.matrix_history = MatrixHistory(int(history_config.get('max_bytes', DEFAULT_MAX_BYTES)))
         self.user_id = None
+        operation_cache_config = load_config().get('operation_cache', {})
+        self.operation_cache = OperationCache(
+            int(operation_cache_config.get('max_bytes', DEFAULT_OPERATION_CACHE_BYTES)),
+            self.matrix_database if operation_cache_config.get('persist', False) else None)
+        self.instrumentation_config = load_config().get('instrumentation', {})
+        instrumentation.hook_engine(self.matrix_database.engine)
+        if self.instrumentation_config.get('enabled', False):
+            instrumentation.enable(self.instrumentation_config.get('trace_allocations', False))
 
     def build(self):
         self.screen_manager.add_widget(SelectUserScreen(name='SelectUserScreen'))
@@ -165,8 +168,59 @@ class ZeroOneMatricesTool(App):
         self.screen_manager.add_widget(LoadMatrixScreen(name='LoadMatrixScreen'))
         self.screen_manager.add_widget(MatrixEditorScreen(name='MatrixEditorScreen'))
         self.screen_manager.add_widget(SaveMatrixScreen(name='SaveMatrixScreen'))
+        self.screen_manager.bind(current=self.track_current_screen)
+        instrumentation.current_screen = self.screen_manager.current
         return self.screen_manager
 
+    @staticmethod
+    def track_current_screen(screen_manager, screen_name):
+        instrumentation.current_screen = screen_name
+
+    def on_stop(self):
+        if self.running_task is not None:
+            self.running_task.cancel()
+        self.background_worker.shutdown()
+
+    def run_in_background(self, status_text, work, on_done, cancellable=False):
+        """
+        Runs work(task) on the background worker while the conflicting buttons are disabled, then passes its
+        result to on_done on the main thread. Errors are shown in a popup.
+        :param status_text: Describes the work while it runs
+        :param work:
+        :param on_done:
+        :param cancellable: Whether the cancel button may stop the work
+        :return:
+        """
+        def finish():
+            self.running_task = None
+            self.busy = self.cancellable = False
+            self.status_text = ''
+
+        def done(result):
+            finish()
+            on_done(result)
+
+        def failed(error):
+            finish()
+            Popup(title='Error', content=Label(text=str(error)), size_hint=(0.5, 0.5)).open()
+
+        def update_progress(percent):
+            self.progress = percent
+
+        self.busy = True
+        self.cancellable = cancellable
+        self.progress = 0
+        self.status_text = status_text
+        self.running_task = self.background_worker.submit(work, done, failed, update_progress, finish)
+
+    def cancel_operation(self):
+        """
+        Cancels the running background task, if it can be cancelled
+        :return:
+        """
+        if self.cancellable and self.running_task is not None:
+            self.running_task.cancel()
+
     def log_in(self):
         """
         Logs the user in.
@@ -177,8 +231,8 @@ class ZeroOneMatricesTool(App):
             Popup(title='User not selected', content=Label(text='Must select user!'),
                   size_hint=(0.5, 0.5)).open()
         else:
-            self.user_id = self.database_session.query(User).filter(
-                User.username == selected_user).one().user_id
+            with self.matrix_database.session_scope() as session:
+                self.user_id = session.scalars(select(User.user_id).where(User.username == selected_user)).one()
             self.root.current = 'HomeScreen'
 
     def create_user(self):
@@ -190,39 +244,31 @@ class ZeroOneMatricesTool(App):
         if entered_username == '':
             Popup(title='Invalid username', content=Label(text='Username cannot be blank!'),
                   size_hint=(0.5, 0.5)).open()
-        elif self.database_session.query(User).filter(
-                User.username == entered_username).count() > 0:
+            return
+        with self.matrix_database.session_scope() as session:
+            username_taken = session.query(User).filter(User.username == entered_username).count() > 0
+            if not username_taken:
+                session.add(User(username=entered_username))
+        if username_taken:
             self.root.get_screen(
                 'CreateUserScreen').ids.create_user_text_input.text = ''
             Popup(title='Invalid username', content=Label(text='Username taken!'),
                   size_hint=(0.5, 0.5)).open()
         else:
-            self.database_session.add(User(username=entered_username))
-            self.database_session.commit()
             self.root.get_screen(
                 'CreateUserScreen').ids.create_user_text_input.text = ''
             self.screen_manager.current = 'SelectUserScreen'
 
     def build_matrix_entry_box(self):
         """
-        Constructs a BoxLayout with text inputs allowing the user to enter their matrix.
+        Shows an all zero matrix of the entered size in the entry grid, where the user clicks entries to enter their matrix.
         """
-        matrix_entry_box = self.root.get_screen(
-            'EnterMatrixScreen').ids.matrix_entry_box
+        enter_matrix_screen = self.root.get_screen('EnterMatrixScreen')
         try:
             matrix_size = int(self.root.get_screen(
                 'HomeScreen').ids.matrix_size_text_input.text)
-            matrix_entry_box.clear_widgets()
-            self.root.get_screen('EnterMatrixScreen').entered_matrix.clear()
-            for i in range(matrix_size):
-                row_box = BoxLayout(orientation='horizontal')
-                matrix_entry_box.add_widget(row_box)
-                for j in range(matrix_size):
-                    zero_one_text_input = ZeroOneTextInput(hint_text='0/1', font_size='10sp', write_tab=False,
-                                                           multiline=False)
-                    self.root.get_screen('EnterMatrixScreen').entered_matrix[
-                        f'{i},{j}'] = zero_one_text_input
-                    row_box.add_widget(zero_one_text_input)
+            enter_matrix_screen.entered_matrix = BooleanMatrix(matrix_size)
+            enter_matrix_screen.ids.matrix_entry_grid.set_matrix(enter_matrix_screen.entered_matrix)
             self.screen_manager.current = 'EnterMatrixScreen'
         except ValueError:
             if self.root.get_screen('HomeScreen').ids.matrix_size_text_input.text == '':
@@ -232,99 +278,121 @@ class ZeroOneMatricesTool(App):
                 Popup(title='Value Error', content=Label(text='Value Error has occurred!'),
                       size_hint=(0.5, 0.5)).open()
 
+    def toggle_entry_cell(self, row, col):
+        """
+        Flips one entry of the matrix being entered
+        :param row:
+        :param col:
+        :return:
+        """
+        enter_matrix_screen = self.root.get_screen('EnterMatrixScreen')
+        entered_matrix = enter_matrix_screen.entered_matrix
+        enter_matrix_screen.entered_matrix = entered_matrix.with_cell(row, col, 1 - entered_matrix.get(row, col))
+        enter_matrix_screen.ids.matrix_entry_grid.set_matrix(enter_matrix_screen.entered_matrix)
+
     def stack_entered_matrix(self):
         """
 
         Updates the stack to only have the entered matrix
 
         """
-        self.matrices_stack.clear()
-        matrix_size = int(self.root.get_screen('HomeScreen').ids.matrix_size_text_input.text)
-        matrix = {}
-        for i in range(matrix_size):
-            for j in range(matrix_size):
-                entry_value = self.root.get_screen('EnterMatrixScreen').entered_matrix[
-                    f'{i},{j}'].text
-                if entry_value == '':
-                    entry_value = '0'
-                matrix[f'{i},{j}'] = entry_value
-        self.matrices_stack.append(matrix)
+        self.matrix_history.reset(self.root.get_screen('EnterMatrixScreen').entered_matrix)
         self.update_displayed_matrix()
         app.root.current = 'MatrixEditorScreen'
 
-    def populate_load_matrix_list(self, search_query):
+    def populate_load_matrix_list(self, search_query, compose=None):
         """
         Populates the list of matrices the user has saved, adhering to the search query
         :param search_query:
+        :param compose: Whether picking a matrix composes the matrix in the matrix editor with it instead of
+        opening it, or None to keep the current choice
         :return:
         """
         load_screen = self.screen_manager.get_screen('LoadMatrixScreen')
+        load_screen.search_query = search_query
+        if compose is not None:
+            load_screen.compose = compose
+            load_screen.ids.load_matrix_prompt.text = 'Select Matrix to Compose With:' if compose else 'Select Matrix:'
+        load_screen.page_keys = [None]
+        load_screen.saved_matrices = []
+        load_screen.has_next_page = False
         load_screen.ids.load_matrix_select_box.clear_widgets()
-        load_screen.saved_matrices.clear()
-        if search_query == '':
-            load_screen.saved_matrices = self.database_session.query(Matrix).filter(
-                Matrix.user_id == self.user_id).all()
-        else:
-            iterated_saved_matrices = self.database_session.query(Matrix).filter(
-                Matrix.user_id == self.user_id).all()
-            for matrix in iterated_saved_matrices:
-                if search_query.lower().strip() in matrix.name.lower().strip():
-                    load_screen.saved_matrices.append(matrix)
-        load_screen.saved_matrices.reverse()
-        load_screen.display_index = 0
-        self.display_load_matrix_list(load_screen.display_index)
         app.root.current = 'LoadMatrixScreen'
+        self.fetch_load_matrix_page()
 
-    def display_load_matrix_list(self, begin_index):
+    def fetch_load_matrix_page(self):
         """
-        Constructs a BoxLayout with a list of save matrices, showing five at a time, allowing the user to load previously saved matrices
-        :param begin_index:
+        Fetches the page of saved matrices starting after the most recent key in the load screen's page keys
         :return:
         """
         load_screen = self.screen_manager.get_screen('LoadMatrixScreen')
-        load_screen.ids.load_matrix_select_box.clear_widgets()
-        if not load_screen.saved_matrices:
-            load_screen.ids.load_matrix_select_box.add_widget(
-                SelfFormattingText(text='No matrices found!',
-                                   font_size='30sp'))
-            app.root.current = 'LoadMatrixScreen'
-        else:
-            if begin_index + 5 < len(
-                    load_screen.saved_matrices):
-                end_index = begin_index + 5
-                empty_spaces = 0
-            else:
-                end_index = len(load_screen.saved_matrices)
-                empty_spaces = begin_index + 5 - len(
-                    load_screen.saved_matrices)
-            for i in range(begin_index, end_index):
+        user_id, search_query, after_key = self.user_id, load_screen.search_query, load_screen.page_keys[-1]
+
+        def fetch_page(task):
+            with self.matrix_database.session_scope() as session:
+                return self.matrix_database.find_matrices_page(session, user_id, search_query, after_key,
+                                                               LOAD_MATRIX_PAGE_SIZE)
+
+        def show_page(page):
+            load_screen.saved_matrices, load_screen.has_next_page = page
+            self.display_load_matrix_list()
+
+        self.run_in_background('Searching matrices', fetch_page, show_page)
+
+    def display_load_matrix_list(self):
+        """
+        Constructs a BoxLayout with the current page of saved matrices, allowing the user to load previously saved matrices
+        :return:
+        """
+        load_screen = self.screen_manager.get_screen('LoadMatrixScreen')
+        with instrumentation.measure('render', 'display_load_matrix_list', len(load_screen.saved_matrices)):
+            load_screen.ids.load_matrix_select_box.clear_widgets()
+            if not load_screen.saved_matrices:
                 load_screen.ids.load_matrix_select_box.add_widget(
-                    LoadMatrixSelectBox(matrix_id=str(load_screen.saved_matrices[i].matrix_id),
-                                        matrix_name=load_screen.saved_matrices[i].name,
-                                        save_timestamp=load_screen.saved_matrices[i].timestamp.strftime(
-                                            "%Y-%m-%d %H:%M:%S")))
-            for i in range(empty_spaces):
-                load_screen.ids.load_matrix_select_box.add_widget(Widget())
+                    SelfFormattingText(text='No matrices found!',
+                                       font_size='30sp'))
+                app.root.current = 'LoadMatrixScreen'
+            else:
+                for saved_matrix in load_screen.saved_matrices:
+                    load_screen.ids.load_matrix_select_box.add_widget(
+                        LoadMatrixSelectBox(matrix_id=str(saved_matrix.matrix_id),
+                                            matrix_name=saved_matrix.name,
+                                            save_timestamp=saved_matrix.timestamp.strftime(
+                                                "%Y-%m-%d %H:%M:%S")))
+                for i in range(LOAD_MATRIX_PAGE_SIZE - len(load_screen.saved_matrices)):
+                    load_screen.ids.load_matrix_select_box.add_widget(Widget())
 
     def move_load_matrix_list_previous(self):
         """
-        Moves the displayed matrices list 5 elements towards the beginning of the list
+        Moves the displayed matrices list one page towards the beginning of the list
         :return:
         """
         load_screen = self.screen_manager.get_screen('LoadMatrixScreen')
-        if load_screen.display_index - 5 >= 0:
-            load_screen.display_index -= 5
-            self.display_load_matrix_list(load_screen.display_index)
+        if len(load_screen.page_keys) > 1:
+            load_screen.page_keys.pop()
+            self.fetch_load_matrix_page()
 
     def move_load_matrix_list_next(self):
         """
-        Moves the displayed matrices list 5 elements towards the end of the list
+        Moves the displayed matrices list one page towards the end of the list
         :return:
         """
         load_screen = self.screen_manager.get_screen('LoadMatrixScreen')
-        if load_screen.display_index + 5 < len(load_screen.saved_matrices):
-            load_screen.display_index += 5
-            self.display_load_matrix_list(load_screen.display_index)
+        if load_screen.has_next_page:
+            last_matrix = load_screen.saved_matrices[-1]
+            load_screen.page_keys.append((last_matrix.timestamp, last_matrix.matrix_id))
+            self.fetch_load_matrix_page()
+
+    def select_saved_matrix(self, matrix_id):
+        """
+        Opens the picked saved matrix, or composes the matrix in the matrix editor with it
+        :param matrix_id:
+        :return:
+        """
+        if self.screen_manager.get_screen('LoadMatrixScreen').compose:
+            self.compose_with_saved_matrix(matrix_id)
+        else:
+            self.stack_saved_matrix(matrix_id)
 
     def stack_saved_matrix(self, matrix_id):
         """
@@ -332,184 +400,256 @@ class ZeroOneMatricesTool(App):
         :param matrix_id:
         :return:
         """
-        self.matrices_stack.clear()
-        constructed_matrix = {}
-        elements = self.database_session.query(MatrixElement).filter(MatrixElement.matrix_id == int(matrix_id)).all()
-        for element in elements:
-            constructed_matrix[f'{element.row},{element.col}'] = str(element.value)
-        self.matrices_stack.append(constructed_matrix)
-        self.update_displayed_matrix()
-        app.root.current = 'MatrixEditorScreen'
+        def load(task):
+            with self.matrix_database.session_scope() as session:
+                return self.matrix_database.load_matrix(session, int(matrix_id))
+
+        def show_matrix(matrix):
+            self.matrix_history.reset(matrix)
+            self.update_displayed_matrix()
+            app.root.current = 'MatrixEditorScreen'
+
+        self.run_in_background('Loading matrix', load, show_matrix)
 
     def update_displayed_matrix(self):
         """
 
-        Updates the displayed matrix to the most recent
+        Updates the displayed matrix to the most recent, redrawing only the visible entries that changed
 
         """
-        matrix_display_box = self.root.get_screen(
-            'MatrixEditorScreen').ids.matrix_editor_display_box
-        matrix_display_box.clear_widgets()
-        displayed_matrix = self.matrices_stack[-1]
-        matrix_size = int(math.sqrt(len(displayed_matrix)))
-        for i in range(matrix_size):
-            row_box = BoxLayout(orientation='horizontal')
-            matrix_display_box.add_widget(row_box)
-            for j in range(matrix_size):
-                matrix_display_label = SelfFormattingText(
-                    text=displayed_matrix[f'{i},{j}'])
-                row_box.add_widget(matrix_display_label)
+        self.root.get_screen('MatrixEditorScreen').ids.matrix_editor_grid.set_matrix(self.matrix_history.current)
 
     def undo_operation(self):
         """
-        Removes one matrix from the stack and displays the new top matrix
+        Reverts the matrix to the state before the most recent operation
         :return:
         """
-        if len(self.matrices_stack) > 1:
-            self.matrices_stack.pop(-1)
+        if self.matrix_history.undo():
             self.update_displayed_matrix()
 
+    def redo_operation(self):
+        """
+        Reapplies the most recently undone operation
+        :return:
+        """
+        if self.matrix_history.redo():
+            self.update_displayed_matrix()
+
+    def push_matrix(self, updated_matrix):
+        """
+        Records the result of an operation in the history, unless the operation left the matrix unchanged
+        :param updated_matrix:
+        :return:
+        """
+        if updated_matrix is not self.matrix_history.current:
+            self.matrix_history.push(updated_matrix)
+            self.update_displayed_matrix()
+
+    def toggle_cell(self, row, col):
+        """
+        Flips one entry of the matrix in the matrix editor. The transitive closure is updated incrementally
+        rather than recomputed when it is already known.
+        :param row:
+        :param col:
+        :return:
+        """
+        current_matrix = self.matrix_history.current
+        self.push_matrix(current_matrix.with_cell(row, col, 1 - current_matrix.get(row, col)))
+
+    def apply_operation(self, operation_name):
+        """
+        Applies the named property operation to the matrix in the matrix editor, measuring it when
+        instrumentation is enabled
+        :param operation_name:
+        :return:
+        """
+        current_matrix = self.matrix_history.current
+        with instrumentation.measure('operation', f'make_{operation_name}', current_matrix.size ** 2):
+            updated_matrix = OPERATIONS[operation_name](current_matrix)
+        self.push_matrix(updated_matrix)
+
     def make_irreflexive(self):
         """
         Applies the irreflexive property to the matrix in the matrix editor
         :return:
         """
-        current_matrix = self.matrices_stack[-1]
-        matrix_size = int(math.sqrt(len(current_matrix)))
-        updated_matrix = {}
-        for i in range(matrix_size):
-            for j in range(matrix_size):
-                if i == j:
-                    updated_matrix[f'{i},{j}'] = '0'
-                else:
-                    updated_matrix[f'{i},{j}'] = current_matrix[f'{i},{j}']
-        self.matrices_stack.append(updated_matrix)
-        self.update_displayed_matrix()
+        self.apply_operation('irreflexive')
 
     def make_anti_symmetric(self):
         """
         Applies the antisymmetric property to the matrix in the matrix editor
         :return:
         """
-        current_matrix = self.matrices_stack[-1]
-        matrix_size = int(math.sqrt(len(current_matrix)))
-        updated_matrix = {}
-        for i in range(matrix_size):
-            for j in range(i, matrix_size):
-                if i != j:
-                    updated_matrix[f'{i},{j}'] = current_matrix[f'{i},{j}']
-                    if current_matrix[f'{i},{j}'] == '1':
-                        updated_matrix[f'{j},{i}'] = '0'
-                    else:
-                        updated_matrix[f'{j},{i}'] = current_matrix[
-                            f'{j},{i}']
-                else:
-                    updated_matrix[f'{i},{j}'] = current_matrix[
-                        f'{i},{j}']
-        self.matrices_stack.append(updated_matrix)
-        self.update_displayed_matrix()
+        self.apply_operation('anti_symmetric')
 
     def make_asymmetric(self):
         """
         Applies the asymmetric property to the matrix in the matrix editor
         :return:
         """
-        current_matrix = self.matrices_stack[-1]
-        matrix_size = int(math.sqrt(len(current_matrix)))
-        updated_matrix = {}
-        for i in range(matrix_size):
-            for j in range(i, matrix_size):
-                if i != j:
-                    updated_matrix[f'{i},{j}'] = current_matrix[f'{i},{j}']
-                    if current_matrix[f'{i},{j}'] == '1':
-                        updated_matrix[f'{j},{i}'] = '0'
-                    else:
-                        updated_matrix[f'{j},{i}'] = current_matrix[
-                            f'{j},{i}']
-                else:
-                    updated_matrix[f'{i},{j}'] = '0'
-        self.matrices_stack.append(updated_matrix)
-        self.update_displayed_matrix()
+        self.apply_operation('asymmetric')
 
     def make_reflexive(self):
         """
         Applies the reflexive property to the matrix in the matrix editor
         :return:
         """
-        current_matrix = self.matrices_stack[-1]
-        matrix_size = int(math.sqrt(len(current_matrix)))
-        updated_matrix = {}
-        for i in range(matrix_size):
-            for j in range(matrix_size):
-                if i == j:
-                    updated_matrix[f'{i},{j}'] = '1'
-                else:
-                    updated_matrix[f'{i},{j}'] = current_matrix[
-                        f'{i},{j}']
-        self.matrices_stack.append(updated_matrix)
-        self.update_displayed_matrix()
+        self.apply_operation('reflexive')
 
     def make_symmetric(self):
         """
         Applies the symmetric property to the matrix in the matrix editor
         :return:
         """
-        current_matrix = self.matrices_stack[-1]
-        matrix_size = int(math.sqrt(len(current_matrix)))
-        updated_matrix = {}
-        for i in range(matrix_size):
-            for j in range(i, matrix_size):
-                if current_matrix[f'{i},{j}'] == '1' or current_matrix[
-                    f'{j},{i}'] == '1':
-                    updated_matrix[f'{i},{j}'] = updated_matrix[f'{j},{i}'] = '1'
-                else:
-                    updated_matrix[f'{i},{j}'] = updated_matrix[f'{j},{i}'] = '0'
-        self.matrices_stack.append(updated_matrix)
-        self.update_displayed_matrix()
+        self.apply_operation('symmetric')
 
     def make_transitive(self):
         """
-        Applies the transitive property to the matrix in the matrix editor
+        Applies the transitive property to the matrix in the matrix editor. The closure is computed in the
+        background and can be cancelled, unless the operation cache already holds it.
         :return:
         """
-        current_matrix = self.matrices_stack[-1]
-        matrix_size = int(math.sqrt(len(current_matrix)))
-        updated_matrix = current_matrix.copy()
-        for k in range(matrix_size):  # Warshall's algorithm
-            for i in range(matrix_size):
-                for j in range(matrix_size):
-                    ik = updated_matrix[f'{i},{k}']
-                    kj = updated_matrix[f'{k},{j}']
-                    if ik == '1' and kj == '1':
-                        updated_matrix[f'{i},{j}'] = '1'
-        self.matrices_stack.append(updated_matrix)
-        self.update_displayed_matrix()
+        current_matrix = self.matrix_history.current
+
+        def close(task):
+            with instrumentation.measure('operation', 'make_transitive', current_matrix.size ** 2):
+                return self.operation_cache.apply(current_matrix, 'transitive', task.report_progress)
+
+        self.run_in_background('Computing transitive closure', close, self.push_matrix, cancellable=True)
 
     def make_equivalent(self):
         """
-        Makes the matrix an equivalence relation in the matrix editor
+        Makes the matrix an equivalence relation in the matrix editor, in the background since the operation
+        cache may read the database
         :return:
         """
-        current_matrix = self.matrices_stack[-1]
-        matrix_size = int(math.sqrt(len(current_matrix)))
-        updated_matrix = {}
-        for i in range(matrix_size):
-            for j in range(matrix_size):
-                if i == j:
-                    updated_matrix[f'{i},{j}'] = '1'
-                elif current_matrix[f'{i},{j}'] == '1' or current_matrix[f'{j},{i}'] == '1':
-                    updated_matrix[f'{i},{j}'] = updated_matrix[f'{j},{i}'] = '1'
-                else:
-                    updated_matrix[f'{i},{j}'] = updated_matrix[f'{j},{i}'] = '0'
-        for k in range(matrix_size):  # Warshall's algorithm
-            for i in range(matrix_size):
-                for j in range(matrix_size):
-                    ik = updated_matrix[f'{i},{k}']
-                    kj = updated_matrix[f'{k},{j}']
-                    if ik == '1' and kj == '1':
-                        updated_matrix[f'{i},{j}'] = '1'
-        self.matrices_stack.append(updated_matrix)
-        self.update_displayed_matrix()
+        current_matrix = self.matrix_history.current
+
+        def close(task):
+            with instrumentation.measure('operation', 'make_equivalent', current_matrix.size ** 2):
+                return self.operation_cache.apply(current_matrix, 'equivalent')
+
+        self.run_in_background('Computing equivalence closure', close, self.push_matrix)
+
+    def apply_operation_chain(self):
+        """
+        Applies the chain of operations entered in the matrix editor, e.g. symmetric,reflexive,transitive. The
+        chain is planned and run in the background, and recorded as a single history entry.
+        :return:
+        """
+        chain_text = self.root.get_screen('MatrixEditorScreen').ids.operation_chain_text_input.text
+        try:
+            operation_names = parse_operation_names(chain_text)
+        except ValueError as error:
+            Popup(title='Unknown operation', content=Label(text=str(error), text_size=(400, None)),
+                  size_hint=(0.5, 0.5)).open()
+            return
+        current_matrix = self.matrix_history.current
+
+        def run_chain(task):
+            with instrumentation.measure('operation', chain_text, current_matrix.size ** 2):
+                return run_pipeline(current_matrix, operation_names,
+                                    lambda matrix, name: self.operation_cache.apply(matrix, name, task.report_progress))
+
+        self.run_in_background('Applying operation chain', run_chain, self.push_matrix, cancellable=True)
+
+    def compose_with_saved_matrix(self, matrix_id):
+        """
+        Replaces the matrix in the matrix editor with its composition with a saved matrix of the same size
+        :param matrix_id:
+        :return:
+        """
+        current_matrix = self.matrix_history.current
+
+        def compose(task):
+            with self.matrix_database.session_scope() as session:
+                saved_matrix = self.matrix_database.load_matrix(session, int(matrix_id))
+            with instrumentation.measure('operation', 'compose', current_matrix.size ** 2):
+                return current_matrix.compose(saved_matrix)
+
+        def show_composition(composition):
+            app.root.current = 'MatrixEditorScreen'
+            self.push_matrix(composition)
+
+        self.run_in_background('Composing matrices', compose, show_composition)
+
+    def read_step_count(self):
+        """
+        Returns the number entered in the matrix editor's step count input, showing a popup if it is blank
+        :return: The number, or None if it is blank
+        """
+        step_count_text = self.root.get_screen('MatrixEditorScreen').ids.step_count_text_input.text
+        if step_count_text == '':
+            Popup(title='Value Error', content=Label(text='k cannot be blank!'), size_hint=(0.5, 0.5)).open()
+            return None
+        return int(step_count_text)
+
+    def make_power(self):
+        """
+        Replaces the matrix in the matrix editor with its k-th power, k being the entered step count
+        :return:
+        """
+        exponent = self.read_step_count()
+        if exponent is None:
+            return
+        current_matrix = self.matrix_history.current
+
+        def multiply(task):
+            with instrumentation.measure('operation', 'power', current_matrix.size ** 2):
+                return current_matrix.power(exponent)
+
+        self.run_in_background(f'Computing power {exponent}', multiply, self.push_matrix)
+
+    def make_reachable_within(self):
+        """
+        Replaces the matrix in the matrix editor with the relation of which elements reach which within k steps,
+        k being the entered step count
+        :return:
+        """
+        steps = self.read_step_count()
+        if steps is None:
+            return
+        current_matrix = self.matrix_history.current
+
+        def reach(task):
+            with instrumentation.measure('operation', 'reachable_within', current_matrix.size ** 2):
+                return current_matrix.reachable_within(steps)
+
+        self.run_in_background(f'Computing reachability within {steps} steps', reach, self.push_matrix)
+
+    def toggle_performance_overlay(self):
+        """
+        Shows or hides the performance overlay in the matrix editor, enabling instrumentation while it is shown
+        unless config.json enables it permanently
+        :return:
+        """
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            if not instrumentation.enabled:
+                instrumentation.enable(self.instrumentation_config.get('trace_allocations', False))
+            self.refresh_performance_overlay()
+            Clock.schedule_interval(self.refresh_performance_overlay, 0.5)
+        else:
+            Clock.unschedule(self.refresh_performance_overlay)
+            if not self.instrumentation_config.get('enabled', False):
+                instrumentation.disable()
+
+    def refresh_performance_overlay(self, *args):
+        self.overlay_text = instrumentation.summary() or 'No measurements yet'
+
+    def export_instrumentation(self):
+        """
+        Writes the measurements collected so far to the trace file named in config.json
+        :return:
+        """
+        trace_path = self.instrumentation_config.get('trace_path', 'instrumentation_trace.json')
+        try:
+            with open(trace_path, 'w') as trace_file:
+                instrumentation.write_trace(trace_file)
+        except OSError as error:
+            Popup(title='Export failed', content=Label(text=str(error)), size_hint=(0.5, 0.5)).open()
+            return
+        Popup(title='Exported', content=Label(text=f'Trace written to {trace_path}'), size_hint=(0.5, 0.5)).open()
 
     def save_matrix(self):
         """
@@ -519,24 +659,29 @@ class ZeroOneMatricesTool(App):
         matrix_name = self.root.get_screen('SaveMatrixScreen').ids.save_matrix_name_text_input.text
         if matrix_name == '':
             Popup(title='Empty Name', content=Label(text='Name cannot be blank!'), size_hint=(0.5, 0.5)).open()
-        elif self.database_session.query(Matrix).filter(Matrix.name == matrix_name,
-                                                        Matrix.user_id == self.user_id).count() == 0:
-            current_timestamp = datetime.now()
-            new_matrix = Matrix(user_id=self.user_id, timestamp=current_timestamp, name=matrix_name)
-            self.database_session.add(new_matrix)
-            self.database_session.flush()
-            current_matrix = self.matrices_stack[-1]
-            for key in current_matrix:
-                row, col = map(int, key.split(','))
-                self.database_session.add(
-                    MatrixElement(matrix_id=new_matrix.matrix_id, row=row, col=col, value=current_matrix[key]))
-            self.database_session.commit()
-            Popup(title='Success', content=Label(text='Matrix Saved'), size_hint=(0.5, 0.5)).open()
-            self.root.current = 'MatrixEditorScreen'
-            self.root.get_screen('SaveMatrixScreen').ids.save_matrix_name_text_input.text = ''
-        else:
-            Popup(title='Name taken', content=Label(text='Name already used!'), size_hint=(0.5, 0.5)).open()
-            self.root.get_screen('SaveMatrixScreen').ids.save_matrix_name_text_input.text = ''
+            return
+        user_id, current_matrix = self.user_id, self.matrix_history.current
+
+        def save(task):
+            with self.matrix_database.session_scope() as session:
+                name_taken = session.query(Matrix).filter(Matrix.name == matrix_name,
+                                                          Matrix.user_id == user_id).count() > 0
+                if not name_taken:
+                    current_timestamp = datetime.now()
+                    self.matrix_database.save_matrix(session, user_id, matrix_name, current_matrix,
+                                                     current_timestamp)
+            return name_taken
+
+        def show_outcome(name_taken):
+            if not name_taken:
+                Popup(title='Success', content=Label(text='Matrix Saved'), size_hint=(0.5, 0.5)).open()
+                self.root.current = 'MatrixEditorScreen'
+                self.root.get_screen('SaveMatrixScreen').ids.save_matrix_name_text_input.text = ''
+            else:
+                Popup(title='Name taken', content=Label(text='Name already used!'), size_hint=(0.5, 0.5)).open()
+                self.root.get_screen('SaveMatrixScreen').ids.save_matrix_name_text_input.text = ''
+
+        self.run_in_background('Saving matrix', save, show_outcome)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,154 @@
+import math
+
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, Rectangle
+from kivy.metrics import dp
+from kivy.properties import BooleanProperty, NumericProperty
+from kivy.uix.widget import Widget
+
+from ZeroOneMatricesTool.instrumentation import instrumentation
+
+MIN_CELL_SIZE = dp(20)
+
+
+class MatrixGrid(Widget):
+    """
+    Displays a BooleanMatrix inside a ScrollView by drawing on the canvas instead of creating a widget per cell.
+
+    Only the cells inside the visible viewport are drawn, all sharing two cached '0' and '1' textures. When a
+    new matrix of the same size is shown, only the visible cells whose value changed are updated, found by
+    XORing the bitset rows of the old and new matrices.
+    """
+
+    editable = BooleanProperty(False)  # Whether pressing a cell dispatches on_cell_press
+    cell_size = NumericProperty(MIN_CELL_SIZE)
+
+    __events__ = ('on_cell_press',)
+
+    def __init__(self, **kwargs):
+        self.matrix = None
+        self.visible_rows = range(0)
+        self.visible_cols = range(0)
+        self.cell_rectangles = {}  # (row, col) -> Rectangle drawing that visible cell
+        self.value_textures = ()
+        super().__init__(**kwargs)
+        self.size_hint = (None, None)
+        self.bind(parent=self.bind_scroll_view)
+
+    def on_cell_press(self, row, col):
+        pass
+
+    def bind_scroll_view(self, instance, scroll_view):
+        if scroll_view is not None:
+            scroll_view.bind(size=self.fit_cell_size, scroll_x=self.update_viewport, scroll_y=self.update_viewport)
+
+    def set_matrix(self, matrix):
+        """
+        Shows matrix, redrawing only the visible cells that differ from the matrix shown before
+        :param matrix:
+        :return:
+        """
+        previous_matrix = self.matrix
+        self.matrix = matrix
+        if previous_matrix is None or previous_matrix.size != matrix.size:
+            self.fit_cell_size()
+            return
+        col_mask = ((1 << self.visible_cols.stop) - 1) & ~((1 << self.visible_cols.start) - 1)
+        visible_cells = len(self.visible_rows) * len(self.visible_cols)
+        with instrumentation.measure('render', 'update_changed_cells', visible_cells):
+            for i in self.visible_rows:
+                changed_cols = (previous_matrix.rows[i] ^ matrix.rows[i]) & col_mask
+                while changed_cols:
+                    low_bit = changed_cols & -changed_cols
+                    j = low_bit.bit_length() - 1
+                    texture = self.value_textures[matrix.rows[i] >> j & 1]
+                    rectangle = self.cell_rectangles[i, j]
+                    rectangle.texture = texture
+                    rectangle.size = texture.size
+                    rectangle.pos = self.texture_position(i, j, texture)
+                    changed_cols ^= low_bit
+
+    def fit_cell_size(self, *args):
+        """
+        Sizes the cells to fill the scroll view, down to MIN_CELL_SIZE beyond which the grid scrolls
+        :return:
+        """
+        if self.matrix is None or self.matrix.size == 0:
+            return
+        available = min(self.parent.size) if self.parent is not None else self.cell_size * self.matrix.size
+        self.cell_size = max(MIN_CELL_SIZE, available / self.matrix.size)
+        self.value_textures = tuple(self.render_text(text) for text in ('0', '1'))
+        self.size = (self.cell_size * self.matrix.size, self.cell_size * self.matrix.size)
+        self.update_viewport(force=True)
+
+    def render_text(self, text):
+        label = CoreLabel(text=text, font_size=self.cell_size * 0.5, color=(0.0, 0.0, 0.0, 1.0))
+        label.refresh()
+        return label.texture
+
+    def update_viewport(self, *args, force=False):
+        """
+        Redraws the cells if scrolling or resizing changed which ones are visible
+        :param force: Redraw even if the visible cells are unchanged
+        :return:
+        """
+        if self.matrix is None:
+            return
+        visible_rows, visible_cols = self.find_visible_cells()
+        if not force and visible_rows == self.visible_rows and visible_cols == self.visible_cols:
+            return
+        self.visible_rows, self.visible_cols = visible_rows, visible_cols
+        with instrumentation.measure('render', 'draw_viewport', len(visible_rows) * len(visible_cols)):
+            self.draw_visible_cells()
+
+    def draw_visible_cells(self):
+        self.cell_rectangles.clear()
+        self.canvas.clear()
+        with self.canvas:
+            Color(1.0, 1.0, 1.0, 1.0)  # Leave the textures' own black text untinted
+            for i in self.visible_rows:
+                row = self.matrix.rows[i]
+                for j in self.visible_cols:
+                    texture = self.value_textures[row >> j & 1]
+                    self.cell_rectangles[i, j] = Rectangle(texture=texture, size=texture.size,
+                                                           pos=self.texture_position(i, j, texture))
+
+    def texture_position(self, row, col, texture):
+        """
+        Returns where to draw texture so that it is centred in the cell at (row, col)
+        :param row:
+        :param col:
+        :param texture:
+        :return:
+        """
+        return (self.x + col * self.cell_size + (self.cell_size - texture.width) / 2,
+                self.top - row * self.cell_size - (self.cell_size + texture.height) / 2)
+
+    def find_visible_cells(self):
+        """
+        Returns the ranges of rows and columns inside the scroll view. The ScrollView scrolls by translating its
+        canvas rather than by moving the grid, so the viewport is worked out from scroll_x and scroll_y, in
+        the grid's own coordinates measured from its bottom left corner.
+        :return:
+        """
+        size = self.matrix.size
+        view = self.parent
+        if view is None:
+            return range(size), range(size)
+        view_left = view.scroll_x * max(0, self.width - view.width)
+        view_bottom = view.scroll_y * max(0, self.height - view.height)
+        first_col = max(0, int(view_left // self.cell_size))
+        last_col = min(size, math.ceil((view_left + view.width) / self.cell_size))
+        first_row = max(0, int((self.height - view_bottom - view.height) // self.cell_size))
+        last_row = min(size, math.ceil((self.height - view_bottom) / self.cell_size))
+        return range(first_row, max(first_row, last_row)), range(first_col, max(first_col, last_col))
+
+    def on_touch_down(self, touch):
+        if touch.is_mouse_scrolling or not self.editable or not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+        col = int((touch.x - self.x) // self.cell_size)
+        row = int((self.top - touch.y) // self.cell_size)
+        if 0 <= row < self.matrix.size and 0 <= col < self.matrix.size:
+            self.dispatch('on_cell_press', row, col)
+            return True
+        return super().on_touch_down(touch)
@@ -0,0 +1,151 @@
+"""
+Text reading and writing of matrices. Every format holds any number of matrices separated by blank lines:
+
+    text    one line of 0s and 1s per row
+    csv     one line of comma separated 0s and 1s per row
+    edges   one 'row col' line per 1 entry, after a first line holding the number of elements
+"""
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+
+_VALID_ROW_CHARACTERS = frozenset('01')
+
+
+def read_text_matrices(stream):
+    """
+    Lazily yields every matrix in a text stream
+    :param stream:
+    :return:
+    """
+    rows = []
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            if rows:
+                yield _finish_matrix(rows, line_number)
+                rows = []
+            continue
+        if not _VALID_ROW_CHARACTERS.issuperset(line):
+            raise ValueError(f'Line {line_number}: rows may only contain 0 and 1')
+        if rows and len(line) != len(rows[0]):
+            raise ValueError(f'Line {line_number}: expected {len(rows[0])} entries, got {len(line)}')
+        rows.append(line)
+    if rows:
+        yield _finish_matrix(rows, 'end of input')
+
+
+def _finish_matrix(rows, position):
+    if len(rows) != len(rows[0]):
+        raise ValueError(f'Before line {position}: matrix has {len(rows)} rows but {len(rows[0])} columns')
+    return BooleanMatrix(len(rows), [int(row[::-1], 2) for row in rows])  # Column 0 is the lowest bit
+
+
+def write_text_matrix(stream, matrix):
+    """
+    Writes one matrix followed by a blank line
+    :param stream:
+    :param matrix:
+    :return:
+    """
+    for row in matrix.rows:
+        stream.write(format(row, f'0{matrix.size}b')[::-1] if matrix.size else '')
+        stream.write('\n')
+    stream.write('\n')
+
+
+def _blocks(stream):
+    """
+    Yields the stripped non-blank lines of each blank line separated block, with the line number of each
+    :param stream:
+    :return:
+    """
+    block = []
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if line:
+            block.append((line_number, line))
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def read_csv_matrices(stream):
+    """
+    Lazily yields every matrix in a CSV stream
+    :param stream:
+    :return:
+    """
+    for block in _blocks(stream):
+        rows = []
+        for line_number, line in block:
+            cells = [cell.strip() for cell in line.split(',')]
+            if not _VALID_ROW_CHARACTERS.issuperset(''.join(cells)) or not all(len(cell) == 1 for cell in cells):
+                raise ValueError(f'Line {line_number}: cells may only be 0 or 1')
+            if len(cells) != len(block):
+                raise ValueError(f'Line {line_number}: expected {len(block)} cells, got {len(cells)}')
+            rows.append(int(''.join(reversed(cells)), 2))
+        yield BooleanMatrix(len(rows), rows)
+
+
+def write_csv_matrix(stream, matrix):
+    """
+    Writes one matrix as CSV followed by a blank line
+    :param stream:
+    :param matrix:
+    :return:
+    """
+    for row in matrix.rows:
+        stream.write(','.join(format(row, f'0{matrix.size}b')[::-1]))
+        stream.write('\n')
+    stream.write('\n')
+
+
+def read_edge_list_matrices(stream):
+    """
+    Lazily yields every matrix in an edge list stream
+    :param stream:
+    :return:
+    """
+    for block in _blocks(stream):
+        line_number, line = block[0]
+        try:
+            size = int(line)
+        except ValueError:
+            raise ValueError(f'Line {line_number}: expected the number of elements') from None
+        rows = [0] * size
+        for line_number, line in block[1:]:
+            try:
+                row, col = map(int, line.replace(',', ' ').split())
+            except ValueError:
+                raise ValueError(f'Line {line_number}: expected a row and a column') from None
+            if not (0 <= row < size and 0 <= col < size):
+                raise ValueError(f'Line {line_number}: entry ({row}, {col}) is outside a {size} element relation')
+            rows[row] |= 1 << col
+        yield BooleanMatrix(size, rows)
+
+
+def write_edge_list_matrix(stream, matrix):
+    """
+    Writes one matrix as an edge list followed by a blank line
+    :param stream:
+    :param matrix:
+    :return:
+    """
+    stream.write(f'{matrix.size}\n')
+    for row, col in matrix.ones():
+        stream.write(f'{row} {col}\n')
+    stream.write('\n')
+
+
+TEXT_READERS = {
+    'text': read_text_matrices,
+    'csv': read_csv_matrices,
+    'edges': read_edge_list_matrices,
+}
+
+TEXT_WRITERS = {
+    'text': write_text_matrix,
+    'csv': write_csv_matrix,
+    'edges': write_edge_list_matrix,
+}
@@ -0,0 +1,68 @@
+"""
+Memoization of the expensive property operations, keyed by the content of the input matrix rather than its
+identity, so that applying the same operation to an identical matrix (loaded again, or saved by another
+user) reuses the earlier result
+"""
+import hashlib
+
+from ZeroOneMatricesTool.cache import LRUCache, matrix_memory_size
+from ZeroOneMatricesTool.operations import OPERATIONS
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+MEMOIZED_OPERATIONS = frozenset(('transitive', 'equivalent'))  # The others take less time than hashing the input
+
+
+def matrix_digest(matrix):
+    """
+    Returns the SHA-256 hash of the matrix size and packed rows, as 64 hexadecimal digits
+    :param matrix:
+    :return:
+    """
+    digest = hashlib.sha256(matrix.size.to_bytes(4, 'little'))
+    digest.update(matrix.to_bytes())
+    return digest.hexdigest()
+
+
+class OperationCache(object):
+    """
+    Remembers operation results in memory, least recently used first out once max_bytes is exceeded, and
+    optionally in the operation_results table of a MatrixDatabase so that they outlive the process
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, matrix_database=None):
+        self.results = LRUCache(max_bytes, matrix_memory_size)  # (input digest, operation name) -> result
+        self.matrix_database = matrix_database
+
+    def apply(self, matrix, operation_name, progress=None):
+        """
+        Applies the named operation, reusing the result for an identical matrix when one is known. As with the
+        operations themselves, the matrix is returned unchanged if it already has the property.
+        :param matrix:
+        :param operation_name:
+        :param progress: Passed to make_transitive when a transitive closure has to be computed
+        :return:
+        """
+        if operation_name not in MEMOIZED_OPERATIONS:
+            return OPERATIONS[operation_name](matrix)
+        if operation_name == 'transitive' and matrix.known_closure() is not None:
+            return matrix.make_transitive()
+        key = (matrix_digest(matrix), operation_name)
+        result = self.results.get(key)
+        if result is None and self.matrix_database is not None:
+            with self.matrix_database.session_scope() as session:
+                result = self.matrix_database.load_operation_result(session, *key)
+            if result is not None:
+                self.results.put(key, result)
+        if result is None:
+            if operation_name == 'transitive':
+                result = matrix.make_transitive(progress=progress)
+            else:
+                result = OPERATIONS[operation_name](matrix)
+            self.results.put(key, result)
+            if self.matrix_database is not None:
+                with self.matrix_database.session_scope() as session:
+                    self.matrix_database.save_operation_result(session, *key, result)
+        return matrix if result == matrix else result
+
+    def clear(self):
+        self.results.clear()
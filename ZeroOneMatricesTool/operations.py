@@ -0,0 +1,43 @@
+"""
+Named property operations shared by the command line, batch and pipeline entry points
+"""
+from operator import methodcaller
+
+from ZeroOneMatricesTool.pipeline import run_pipeline
+from ZeroOneMatricesTool.sparse_matrix import choose_representation
+
+# Called by method name so that they work on both BooleanMatrix and SparseBooleanMatrix
+OPERATIONS = {
+    'reflexive': methodcaller('make_reflexive'),
+    'irreflexive': methodcaller('make_irreflexive'),
+    'symmetric': methodcaller('make_symmetric'),
+    'anti_symmetric': methodcaller('make_anti_symmetric'),
+    'asymmetric': methodcaller('make_asymmetric'),
+    'transitive': methodcaller('make_transitive'),
+    'equivalent': methodcaller('make_equivalent'),
+}
+
+
+def parse_operation_names(text):
+    """
+    Splits a comma separated list of operation names, checking each one exists
+    :param text:
+    :return:
+    """
+    operation_names = [name.strip() for name in text.split(',') if name.strip()]
+    for name in operation_names:
+        if name not in OPERATIONS:
+            raise ValueError(f'Unknown operation: {name} (expected one of {", ".join(OPERATIONS)})')
+    return operation_names
+
+
+def apply_operations(matrix, operation_names):
+    """
+    Applies the named operations to matrix in order, switching to the sparse representation first if the
+    matrix is large and sparse. The chain is planned first, so redundant operations are skipped and runs of
+    cheap ones are fused.
+    :param matrix:
+    :param operation_names:
+    :return: The result as a BooleanMatrix or SparseBooleanMatrix
+    """
+    return run_pipeline(choose_representation(matrix), operation_names)
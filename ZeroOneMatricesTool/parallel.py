@@ -0,0 +1,96 @@
+"""
+Multi-process execution of property operations over many matrices.
+
+Matrices cross the process boundary as chunks of packed rows (one bytes object per chunk), never as
+BooleanMatrix objects or dicts, so pickling costs one buffer copy per chunk.
+"""
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.operations import apply_operations
+from ZeroOneMatricesTool.sparse_matrix import to_dense
+
+DEFAULT_CHUNK_SIZE = 16
+
+
+def pack_chunk(matrices):
+    """
+    Packs matrices into a tuple of their sizes and one buffer of their concatenated packed rows
+    :param matrices:
+    :return:
+    """
+    return tuple(matrix.size for matrix in matrices), b''.join(matrix.to_bytes() for matrix in matrices)
+
+
+def unpack_chunk(sizes, packed):
+    """
+    Reverses pack_chunk
+    :param sizes:
+    :param packed:
+    :return:
+    """
+    matrices = []
+    offset = 0
+    packed = memoryview(packed)
+    for size in sizes:
+        length = size * ((size + 7) // 8)
+        matrices.append(BooleanMatrix.from_bytes(size, packed[offset:offset + length]))
+        offset += length
+    return matrices
+
+
+def _process_chunk(sizes, packed, operation_names):
+    results = [to_dense(apply_operations(matrix, operation_names)) for matrix in unpack_chunk(sizes, packed)]
+    return pack_chunk(results)
+
+
+def _chunks(matrices, chunk_size):
+    chunk = []
+    for matrix in matrices:
+        chunk.append(matrix)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_parallel(matrices, operation_names, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, ordered=True):
+    """
+    Applies the named operations to every matrix on a pool of worker processes. The input is consumed
+    lazily, with at most two chunks per worker in flight.
+    :param matrices: Any iterable of BooleanMatrix objects
+    :param operation_names:
+    :param workers: Number of worker processes, defaulting to the number of CPUs
+    :param chunk_size: Number of matrices sent to a worker at a time
+    :param ordered: Whether to yield results in input order, or as soon as each chunk completes
+    :return: A generator of result matrices when ordered, otherwise of (input index, result matrix) pairs
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+    chunks = enumerate(_chunks(matrices, chunk_size))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()  # (chunk number, future) in submission order
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    chunk_number, chunk = next(chunks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append((chunk_number, executor.submit(_process_chunk, *pack_chunk(chunk),
+                                                              operation_names)))
+            if not pending:
+                break
+            if ordered:
+                _, future = pending.popleft()
+                yield from unpack_chunk(*future.result())
+            else:
+                done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+                for chunk_number, future in [entry for entry in pending if entry[1] in done]:
+                    pending.remove((chunk_number, future))
+                    for offset, matrix in enumerate(unpack_chunk(*future.result())):
+                        yield chunk_number * chunk_size + offset, matrix
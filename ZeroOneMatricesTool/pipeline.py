@@ -0,0 +1,198 @@
+"""
+Planning and execution of chains of property operations.
+
+A chain is planned before it runs:
+
+- An operation whose property is already guaranteed by the operations before it is dropped, e.g. the second
+  reflexive in reflexive, symmetric, reflexive.
+- Transitive closure of a relation already made reflexive and symmetric is the equivalence closure, and the
+  equivalence closure of the result of any chain is the equivalence closure of its input, so everything
+  before an equivalent step is dropped.
+- Runs of the O(n^2) operations reflexive, irreflexive, symmetric, anti_symmetric and asymmetric are fused
+  into a single sweep. Diagonal operations commute with the other three, so a run reduces to at most one
+  change to the entries off the diagonal and one assignment to the diagonal.
+
+Only the final matrix of a chain is returned, so the matrix editor records a whole chain as one history entry.
+"""
+from ZeroOneMatricesTool.boolean_matrix import ANTI_SYMMETRIC, ASYMMETRIC, BooleanMatrix, EQUIVALENCE, \
+    IRREFLEXIVE, REFLEXIVE, SYMMETRIC, TRANSITIVE
+from ZeroOneMatricesTool.closure import iterate_bits
+
+SWEEP_OPERATIONS = frozenset(('reflexive', 'irreflexive', 'symmetric', 'anti_symmetric', 'asymmetric'))
+
+# Property each operation guarantees, and the properties that survive it
+GUARANTEES = {
+    'reflexive': REFLEXIVE,
+    'irreflexive': IRREFLEXIVE,
+    'symmetric': SYMMETRIC,
+    'anti_symmetric': ANTI_SYMMETRIC,
+    'asymmetric': ASYMMETRIC,
+    'transitive': TRANSITIVE,
+    'equivalent': EQUIVALENCE,
+}
+PRESERVES = {
+    'reflexive': SYMMETRIC | ANTI_SYMMETRIC | TRANSITIVE,
+    'irreflexive': SYMMETRIC | ANTI_SYMMETRIC | ASYMMETRIC,
+    'symmetric': REFLEXIVE | IRREFLEXIVE,
+    'anti_symmetric': REFLEXIVE | IRREFLEXIVE,
+    'asymmetric': 0,
+    'transitive': REFLEXIVE | SYMMETRIC,
+    'equivalent': 0,
+}
+EQUIVALENT_PROPERTIES = {  # Each property holds exactly when all the properties it maps to hold
+    ASYMMETRIC: IRREFLEXIVE | ANTI_SYMMETRIC,
+    EQUIVALENCE: REFLEXIVE | SYMMETRIC | TRANSITIVE,
+}
+
+
+class PlannedStep(object):
+    """
+    One step of a planned chain: either a single operation, or a run of sweep operations fused into one pass
+    that applies off_diagonal ('symmetric', 'anti_symmetric', 'symmetric_then_anti_symmetric' or None) and
+    sets the diagonal to diagonal (1, 0 or None to leave it)
+    """
+
+    __slots__ = ('operation_names', 'off_diagonal', 'diagonal')
+
+    def __init__(self, operation_names, off_diagonal=None, diagonal=None):
+        self.operation_names = tuple(operation_names)
+        self.off_diagonal = off_diagonal
+        self.diagonal = diagonal
+
+    @property
+    def is_fused(self):
+        return len(self.operation_names) > 1
+
+    def __repr__(self):
+        return '+'.join(self.operation_names)
+
+
+def _with_implied(properties):
+    for flag, components in EQUIVALENT_PROPERTIES.items():
+        if properties & flag:
+            properties |= components
+        elif properties & components == components:
+            properties |= flag
+    return properties
+
+
+def plan_operations(operation_names):
+    """
+    Plans a chain of operations, dropping redundant ones and fusing runs of sweep operations
+    :param operation_names:
+    :return: The list of PlannedStep to execute in order
+    """
+    kept_names = []
+    guaranteed = 0
+    for name in operation_names:
+        if name == 'transitive' and guaranteed & (REFLEXIVE | SYMMETRIC) == REFLEXIVE | SYMMETRIC:
+            name = 'equivalent'
+        if guaranteed & GUARANTEES[name]:
+            continue
+        if name == 'equivalent':
+            kept_names.clear()
+        kept_names.append(name)
+        guaranteed = _with_implied(guaranteed & PRESERVES[name] | GUARANTEES[name])
+    steps = []
+    run = []
+    for name in kept_names + [None]:
+        if name in SWEEP_OPERATIONS:
+            run.append(name)
+            continue
+        if len(run) == 1:
+            steps.append(PlannedStep(run))
+        elif run:
+            steps.append(_fuse(run))
+        run = []
+        if name is not None:
+            steps.append(PlannedStep([name]))
+    return steps
+
+
+def _fuse(run):
+    off_diagonal = None
+    diagonal = None
+    for name in run:
+        if name == 'symmetric':
+            off_diagonal = 'symmetric'
+        elif name in ('anti_symmetric', 'asymmetric'):
+            if off_diagonal in ('symmetric', 'symmetric_then_anti_symmetric'):
+                off_diagonal = 'symmetric_then_anti_symmetric'
+            else:
+                off_diagonal = 'anti_symmetric'
+        if name == 'reflexive':
+            diagonal = 1
+        elif name in ('irreflexive', 'asymmetric'):
+            diagonal = 0
+    return PlannedStep(run, off_diagonal, diagonal)
+
+
+def sweep(matrix, off_diagonal, diagonal):
+    """
+    Applies a fused run of sweep operations to a BooleanMatrix in one pass over its 1 entries
+    :param matrix:
+    :param off_diagonal:
+    :param diagonal:
+    :return: The resulting matrix, or matrix itself if nothing changed
+    """
+    rows = list(matrix.rows)
+    properties = 0
+    if off_diagonal == 'symmetric':
+        for i, j in matrix.ones():
+            rows[j] |= 1 << i
+        properties |= SYMMETRIC
+    elif off_diagonal == 'anti_symmetric':
+        for i, row in enumerate(matrix.rows):
+            for j in iterate_bits(row >> (i + 1) << (i + 1)):  # Entries strictly above the diagonal
+                rows[j] &= ~(1 << i)
+        properties |= ANTI_SYMMETRIC
+    elif off_diagonal == 'symmetric_then_anti_symmetric':
+        # Symmetrizing and then clearing the mirror of every entry above the diagonal leaves the union of the
+        # upper triangle and the transposed lower triangle, above the diagonal only
+        for i, row in enumerate(matrix.rows):
+            lower_triangle = row & ((1 << i) - 1)
+            for j in iterate_bits(lower_triangle):
+                rows[j] |= 1 << i
+            rows[i] &= ~lower_triangle
+        properties |= ANTI_SYMMETRIC
+    if diagonal == 1:
+        rows = [row | 1 << i for i, row in enumerate(rows)]
+        properties |= REFLEXIVE
+    elif diagonal == 0:
+        rows = [row & ~(1 << i) for i, row in enumerate(rows)]
+        properties |= IRREFLEXIVE
+        if properties & ANTI_SYMMETRIC:
+            properties |= ASYMMETRIC
+    if rows == matrix.rows:
+        return matrix
+    return BooleanMatrix(matrix.size, rows, properties)
+
+
+def execute_plan(matrix, plan, apply_operation=None):
+    """
+    Executes a planned chain. Fused steps run as one sweep on a BooleanMatrix; on other representations their
+    operations run one by one.
+    :param matrix:
+    :param plan:
+    :param apply_operation: Called as apply_operation(matrix, name) for each unfused step, by default calling
+    the matrix's make_ method
+    :return:
+    """
+    for step in plan:
+        if step.is_fused and isinstance(matrix, BooleanMatrix):
+            matrix = sweep(matrix, step.off_diagonal, step.diagonal)
+            continue
+        for name in step.operation_names:
+            matrix = apply_operation(matrix, name) if apply_operation else getattr(matrix, f'make_{name}')()
+    return matrix
+
+
+def run_pipeline(matrix, operation_names, apply_operation=None):
+    """
+    Plans and executes a chain of operations
+    :param matrix:
+    :param operation_names:
+    :param apply_operation: See execute_plan
+    :return:
+    """
+    return execute_plan(matrix, plan_operations(operation_names), apply_operation)
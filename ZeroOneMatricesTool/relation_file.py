@@ -0,0 +1,213 @@
+"""
+Binary relation files holding any number of matrices.
+
+A file starts with FILE_HEADER (magic and version). Each matrix follows as a RECORD_HEADER and a payload:
+
+    size          uint32   number of elements n
+    ones          uint64   number of 1 entries, giving the density as ones / n**2
+    fingerprint   uint8    property bits as returned by BooleanMatrix.fingerprint
+    encoding      uint8    PACKED_ENCODING or EDGES_ENCODING
+    length        uint64   payload length in bytes
+
+A packed payload is the rows as written by BooleanMatrix.to_bytes. An edges payload is the (row, col) pair of
+every 1 entry as little-endian uint16, or uint32 when n exceeds 65536. Each matrix uses whichever is smaller.
+All integers are little-endian.
+"""
+import mmap
+import struct
+import sys
+from array import array
+
+from ZeroOneMatricesTool.boolean_matrix import ALL_PROPERTIES, BooleanMatrix
+
+FILE_MAGIC = b'ZOMF'
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3x')
+RECORD_HEADER = struct.Struct('<IQBB2xQ')
+
+PACKED_ENCODING = 0
+EDGES_ENCODING = 1
+
+
+class RelationRecord(object):
+    """
+    The header of one matrix in a relation file, with the location of its payload
+    """
+
+    __slots__ = ('size', 'ones', 'fingerprint', 'encoding', 'offset', 'length')
+
+    def __init__(self, size, ones, fingerprint, encoding, offset, length):
+        self.size = size
+        self.ones = ones
+        self.fingerprint = fingerprint
+        self.encoding = encoding
+        self.offset = offset
+        self.length = length
+
+    @property
+    def density(self):
+        return self.ones / (self.size * self.size) if self.size else 0.0
+
+
+def _edge_typecode(size):
+    return 'H' if size <= 1 << 16 else 'I'
+
+
+def encode_matrix(matrix):
+    """
+    Encodes a matrix as a record header and payload, picking the smaller of the two encodings
+    :param matrix:
+    :return:
+    """
+    ones = matrix.count_ones()
+    typecode = _edge_typecode(matrix.size)
+    edges_length = 2 * ones * array(typecode).itemsize
+    packed_length = matrix.size * ((matrix.size + 7) // 8)
+    if edges_length < packed_length:
+        encoding = EDGES_ENCODING
+        edges = array(typecode)
+        for row, col in matrix.ones():
+            edges.append(row)
+            edges.append(col)
+        if sys.byteorder == 'big':
+            edges.byteswap()
+        payload = edges.tobytes()
+    else:
+        encoding = PACKED_ENCODING
+        payload = matrix.to_bytes()
+    header = RECORD_HEADER.pack(matrix.size, ones, matrix.fingerprint(), encoding, len(payload))
+    return header, payload
+
+
+def decode_matrix(record, payload):
+    """
+    Decodes the payload of a record into a matrix carrying the stored fingerprint
+    :param record:
+    :param payload:
+    :return:
+    """
+    if record.encoding == PACKED_ENCODING:
+        if len(payload) != record.size * ((record.size + 7) // 8):
+            raise ValueError(f'Packed payload at offset {record.offset} does not match a {record.size} element '
+                             f'relation')
+        matrix = BooleanMatrix.from_bytes(record.size, payload)
+    elif record.encoding == EDGES_ENCODING:
+        edges = array(_edge_typecode(record.size))
+        if len(payload) % (2 * edges.itemsize):
+            raise ValueError(f'Edge payload at offset {record.offset} does not hold a whole number of entries')
+        edges.frombytes(payload)
+        if sys.byteorder == 'big':
+            edges.byteswap()
+        largest_index = max(edges, default=-1)
+        if largest_index >= record.size:
+            raise ValueError(f'Entry index {largest_index} at offset {record.offset} is outside a '
+                             f'{record.size} element relation')
+        rows = [0] * record.size
+        for index in range(0, len(edges), 2):
+            rows[edges[index]] |= 1 << edges[index + 1]
+        matrix = BooleanMatrix(record.size, rows)
+    else:
+        raise ValueError(f'Unknown matrix encoding {record.encoding} at offset {record.offset}')
+    matrix.checked_properties = ALL_PROPERTIES
+    matrix.properties = record.fingerprint
+    return matrix
+
+
+class RelationFileWriter(object):
+    """
+    Appends matrices to a new relation file
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION))
+
+    def write(self, matrix):
+        header, payload = encode_matrix(matrix)
+        self.file.write(header)
+        self.file.write(payload)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RelationFileReader(object):
+    """
+    Reads a relation file through a memory map, so that matrices are decoded one at a time and only the
+    pages they occupy are ever loaded
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files cannot be mapped
+            self.file.close()
+            raise ValueError(f'{path} is not a relation file') from None
+        if len(self.map) < FILE_HEADER.size or FILE_HEADER.unpack_from(self.map, 0)[0] != FILE_MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a relation file')
+        version = FILE_HEADER.unpack_from(self.map, 0)[1]
+        if version != FILE_VERSION:
+            self.close()
+            raise ValueError(f'{path} has unsupported relation file version {version}')
+
+    def records(self):
+        """
+        Yields the header of every matrix without decoding any payload
+        :return:
+        """
+        offset = FILE_HEADER.size
+        end = len(self.map)
+        while offset < end:
+            if offset + RECORD_HEADER.size > end:
+                raise ValueError(f'Truncated matrix header at offset {offset}')
+            size, ones, fingerprint, encoding, length = RECORD_HEADER.unpack_from(self.map, offset)
+            offset += RECORD_HEADER.size
+            if offset + length > end:
+                raise ValueError(f'Truncated matrix payload at offset {offset}')
+            yield RelationRecord(size, ones, fingerprint, encoding, offset, length)
+            offset += length
+
+    def read(self, record):
+        """
+        Decodes the matrix a record describes
+        :param record:
+        :return:
+        """
+        return decode_matrix(record, self.map[record.offset:record.offset + record.length])
+
+    def __iter__(self):
+        for record in self.records():
+            yield self.read(record)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_relation_file(path, matrices):
+    """
+    Writes every matrix to a new relation file
+    :param path:
+    :param matrices:
+    :return: The number of matrices written
+    """
+    count = 0
+    with RelationFileWriter(path) as writer:
+        for matrix in matrices:
+            writer.write(matrix)
+            count += 1
+    return count
@@ -0,0 +1,334 @@
+"""
+Compressed sparse row storage for large relations with few 1 entries, and automatic choice between it and
+the dense BooleanMatrix
+"""
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, chain
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.closure import condensed_reachability, find_root, strongly_connected_components
+
+SPARSE_MIN_SIZE = 1024  # Smaller matrices are cheap enough as dense bitsets whatever their density
+SPARSE_MAX_DENSITY = 0.01  # Fraction of 1 entries above which the dense representation is used
+
+
+def _bit_positions(row):
+    """
+    Returns the positions of the set bits of row in increasing order, scanning its binary digits at C speed
+    rather than popping one bit at a time off a large int
+    :param row:
+    :return:
+    """
+    digits = format(row, 'b')[::-1]
+    positions = []
+    position = digits.find('1')
+    while position != -1:
+        positions.append(position)
+        position = digits.find('1', position + 1)
+    return positions
+
+
+class SparseBooleanMatrix(object):
+    """
+    A square 0-1 matrix in compressed sparse row form: the columns of the 1 entries in row i are
+    indices[indptr[i]:indptr[i + 1]], in increasing order. Like BooleanMatrix it is never modified in place.
+    """
+
+    __slots__ = ('size', 'indptr', 'indices')
+
+    def __init__(self, size, indptr, indices):
+        self.size = size
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_row_lists(cls, size, row_lists):
+        """
+        Builds a matrix from one sorted, duplicate free list of columns per row
+        :param size:
+        :param row_lists:
+        :return:
+        """
+        indptr = array('q', [0])
+        indptr.extend(accumulate(len(columns) for columns in row_lists))
+        return cls(size, indptr, array('i', chain.from_iterable(row_lists)))
+
+    @classmethod
+    def from_edges(cls, size, edges):
+        """
+        Builds a matrix from an iterable of (row, col) positions of 1 entries
+        :param size:
+        :param edges:
+        :return:
+        """
+        row_sets = [set() for _ in range(size)]
+        for row, col in edges:
+            row_sets[row].add(col)
+        return cls.from_row_lists(size, [sorted(columns) for columns in row_sets])
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        """
+        Converts a dense BooleanMatrix
+        :param matrix:
+        :return:
+        """
+        return cls.from_row_lists(matrix.size, [_bit_positions(row) for row in matrix.rows])
+
+    def to_matrix(self):
+        """
+        Converts to a dense BooleanMatrix
+        :return:
+        """
+        rows = []
+        for i in range(self.size):
+            row_bytes = bytearray((self.size + 7) // 8)
+            for col in self.row_indices(i):
+                row_bytes[col >> 3] |= 1 << (col & 7)
+            rows.append(int.from_bytes(row_bytes, 'little'))
+        return BooleanMatrix(self.size, rows)
+
+    def row_indices(self, index):
+        """
+        Returns the columns of the 1 entries in the row at index, in increasing order
+        :param index:
+        :return:
+        """
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def row_lists(self):
+        return [list(self.row_indices(i)) for i in range(self.size)]
+
+    def get(self, row, col):
+        """
+        Returns the entry at (row, col) as 0 or 1
+        :param row:
+        :param col:
+        :return:
+        """
+        start, end = self.indptr[row], self.indptr[row + 1]
+        position = bisect_left(self.indices, col, start, end)
+        return int(position < end and self.indices[position] == col)
+
+    def ones(self):
+        """
+        Yields the (row, col) position of every 1 entry in row-major order
+        :return:
+        """
+        for i in range(self.size):
+            for col in self.row_indices(i):
+                yield i, col
+
+    def count_ones(self):
+        return len(self.indices)
+
+    def density(self):
+        return len(self.indices) / (self.size * self.size) if self.size else 0.0
+
+    def transpose(self):
+        """
+        Returns the transpose of the matrix, built with a counting sort over the 1 entries
+        :return:
+        """
+        counts = [0] * (self.size + 1)
+        for col in self.indices:
+            counts[col + 1] += 1
+        indptr = array('q', accumulate(counts))
+        next_position = list(indptr[:-1])
+        indices = array('i', bytes(len(self.indices) * array('i').itemsize))
+        for row in range(self.size):
+            for col in self.row_indices(row):
+                indices[next_position[col]] = row
+                next_position[col] += 1
+        return SparseBooleanMatrix(self.size, indptr, indices)
+
+    def __eq__(self, other):
+        if not isinstance(other, SparseBooleanMatrix):
+            return NotImplemented
+        return self.size == other.size and self.indptr == other.indptr and self.indices == other.indices
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'SparseBooleanMatrix(size={self.size}, ones={self.count_ones()})'
+
+    '''
+    Property operations
+    '''
+
+    def make_reflexive(self):
+        """
+        Returns the matrix with every diagonal entry set to 1
+        :return:
+        """
+        row_lists = []
+        for i in range(self.size):
+            columns = list(self.row_indices(i))
+            position = bisect_left(columns, i)
+            if position == len(columns) or columns[position] != i:
+                columns.insert(position, i)
+            row_lists.append(columns)
+        return SparseBooleanMatrix.from_row_lists(self.size, row_lists)
+
+    def make_irreflexive(self):
+        """
+        Returns the matrix with every diagonal entry set to 0
+        :return:
+        """
+        return SparseBooleanMatrix.from_row_lists(
+            self.size, [[col for col in self.row_indices(i) if col != i] for i in range(self.size)])
+
+    def make_symmetric(self):
+        """
+        Returns the symmetric closure of the matrix, merging each row with the matching row of the transpose
+        :return:
+        """
+        transposed = self.transpose()
+        return SparseBooleanMatrix.from_row_lists(
+            self.size, [sorted(set(self.row_indices(i)).union(transposed.row_indices(i))) for i in range(self.size)])
+
+    def make_anti_symmetric(self):
+        """
+        Returns the matrix with (j, i) cleared wherever (i, j) above the diagonal is 1, keeping the diagonal
+        :return:
+        """
+        transposed = self.transpose()
+        row_lists = []
+        for j in range(self.size):
+            above = {i for i in transposed.row_indices(j) if i < j}  # Rows i < j with (i, j) set
+            row_lists.append([i for i in self.row_indices(j) if i not in above])
+        return SparseBooleanMatrix.from_row_lists(self.size, row_lists)
+
+    def make_asymmetric(self):
+        """
+        Returns the matrix with (j, i) cleared wherever (i, j) above the diagonal is 1, and the diagonal cleared
+        :return:
+        """
+        return self.make_anti_symmetric().make_irreflexive()
+
+    def make_transitive(self):
+        """
+        Returns the transitive closure of the matrix, computed over the condensation of its strongly
+        connected components. Reachability is propagated as sorted vertex lists, one per component, so memory
+        grows with the number of 1 entries in the result rather than with size ** 2. If the result turns out
+        too dense to store sparse, the closure is finished with bitset rows and returned as a BooleanMatrix.
+        :return:
+        """
+        components, component_of = strongly_connected_components(self.row_indices, self.size)
+        successor_lists = []
+        cyclic = []
+        for number, component in enumerate(components):
+            successors = set()
+            for vertex in component:
+                successors.update(component_of[successor] for successor in self.row_indices(vertex))
+            cyclic.append(len(component) > 1 or number in successors)
+            successors.discard(number)
+            successor_lists.append(sorted(successors, reverse=True))  # Nearest successor first
+        if self.size >= SPARSE_MIN_SIZE:
+            reach = self._sparse_reachability(components, component_of, successor_lists, cyclic)
+            if reach is not None:
+                return SparseBooleanMatrix.from_row_lists(
+                    self.size, [reach[component_of[vertex]] for vertex in range(self.size)])
+        member_masks = []
+        successor_masks = []
+        for component, successors in zip(components, successor_lists):
+            member_masks.append(sum(1 << vertex for vertex in component))
+            successor_masks.append(sum(1 << successor for successor in successors))
+        reach = condensed_reachability(member_masks, successor_masks, cyclic)
+        return choose_representation(BooleanMatrix(self.size, [reach[component_of[vertex]]
+                                                                for vertex in range(self.size)]))
+
+    def _sparse_reachability(self, components, component_of, successor_lists, cyclic):
+        """
+        Propagates reachability over the condensation as sorted arrays of vertices
+        :return: The vertices reachable from each component, or None as soon as the closure has more 1 entries
+        than a sparse matrix should hold
+        """
+        max_ones = SPARSE_MAX_DENSITY * self.size * self.size
+        closed_ones = 0
+        reach = []
+        for number, component in enumerate(components):
+            reached = set(component) if cyclic[number] else set()
+            for successor in successor_lists[number]:
+                if components[successor][0] in reached:  # Already reached through a nearer successor
+                    continue
+                reached.update(components[successor])
+                reached.update(reach[successor])
+            closed_ones += len(component) * len(reached)
+            if closed_ones > max_ones:
+                return None
+            reach.append(array('i', sorted(reached)))
+        return reach
+
+    def make_equivalent(self):
+        """
+        Returns the equivalence closure of the matrix
+        :return:
+        """
+        return self.equivalence_closure()[0]
+
+    def equivalence_closure(self):
+        """
+        Returns the equivalence closure of the matrix together with its equivalence classes, computed with
+        union-find over the 1 entries
+        :return: The closed matrix and the classes as sorted lists of elements
+        """
+        parent = list(range(self.size))
+        for row, col in self.ones():
+            root_row, root_col = find_root(parent, row), find_root(parent, col)
+            if root_row != root_col:
+                parent[max(root_row, root_col)] = min(root_row, root_col)
+        classes = {}
+        for element in range(self.size):
+            classes.setdefault(find_root(parent, element), []).append(element)
+        classes = list(classes.values())
+        closed_ones = sum(len(members) ** 2 for members in classes)
+        if is_sparse_enough(self.size, closed_ones):
+            class_of = [None] * self.size
+            for members in classes:
+                for element in members:
+                    class_of[element] = members
+            return SparseBooleanMatrix.from_row_lists(self.size, class_of), classes
+        closed_rows = [0] * self.size
+        for members in classes:
+            mask_bytes = bytearray((self.size + 7) // 8)
+            for element in members:
+                mask_bytes[element >> 3] |= 1 << (element & 7)
+            mask = int.from_bytes(mask_bytes, 'little')
+            for element in members:
+                closed_rows[element] = mask
+        return BooleanMatrix(self.size, closed_rows), classes
+
+
+def is_sparse_enough(size, ones):
+    """
+    Returns whether a size x size matrix with the given number of 1 entries is best stored sparse
+    :param size:
+    :param ones:
+    :return:
+    """
+    return size >= SPARSE_MIN_SIZE and ones <= SPARSE_MAX_DENSITY * size * size
+
+
+def choose_representation(matrix):
+    """
+    Returns the matrix as a SparseBooleanMatrix if it is large and sparse, otherwise as a BooleanMatrix
+    :param matrix:
+    :return:
+    """
+    is_sparse = is_sparse_enough(matrix.size, matrix.count_ones())
+    if isinstance(matrix, SparseBooleanMatrix):
+        return matrix if is_sparse else matrix.to_matrix()
+    return SparseBooleanMatrix.from_matrix(matrix) if is_sparse else matrix
+
+
+def to_dense(matrix):
+    """
+    Returns the matrix as a BooleanMatrix, whichever representation it is in
+    :param matrix:
+    :return:
+    """
+    if isinstance(matrix, SparseBooleanMatrix):
+        return matrix.to_matrix()
+    return matrix
@@ -0,0 +1,41 @@
+import random
+
+import numpy as np
+import pytest
+
+from ZeroOneMatricesTool.batch import BATCH_OPERATIONS, apply_operation, stack_matrices, unstack_matrices
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+
+
+def test_stack_matrices_round_trip():
+    matrices = [BooleanMatrix(10, [(i * 37 + k) % 1024 for i in range(10)]) for k in range(4)]
+    stacked = stack_matrices(matrices)
+    assert stacked.shape == (4, 10, 10)
+    assert unstack_matrices(stacked) == matrices
+
+
+@pytest.mark.parametrize('operation_name', sorted(BATCH_OPERATIONS))
+@pytest.mark.parametrize('size', [0, 1, 2, 7, 9, 33])
+def test_batch_operations_match_matrix_methods(operation_name, size):
+    generator = random.Random(size)
+    matrices = [BooleanMatrix(size, [generator.getrandbits(size) if size else 0 for _ in range(size)])
+                for _ in range(20)]
+    results = unstack_matrices(apply_operation(stack_matrices(matrices), operation_name))
+    assert [result.rows for result in results] == \
+        [getattr(matrix, f'make_{operation_name}')().rows for matrix in matrices]
+
+
+def test_unknown_batch_operation():
+    with pytest.raises(ValueError, match='Unknown batch operation'):
+        apply_operation(stack_matrices([BooleanMatrix(2)]), 'transitive')
+
+
+def test_stack_matrices_empty():
+    stacked = stack_matrices([])
+    assert stacked.shape == (0, 0, 0) and stacked.dtype == np.bool_
+    assert stack_matrices([BooleanMatrix(0), BooleanMatrix(0)]).shape == (2, 0, 0)
+
+
+def test_stack_matrices_rejects_mixed_sizes():
+    with pytest.raises(ValueError, match=r'Expected a \(batch, n, n\)'):
+        stack_matrices([BooleanMatrix(3), BooleanMatrix(4)])
@@ -0,0 +1,95 @@
+import random
+
+from ZeroOneMatricesTool.boolean_matrix import ANTI_SYMMETRIC, ASYMMETRIC, BooleanMatrix, EQUIVALENCE, \
+    IRREFLEXIVE, REFLEXIVE, SYMMETRIC, TRANSITIVE
+from ZeroOneMatricesTool.closure import warshall_closure
+
+
+def test_with_cell_keeps_closure_in_step_with_edits():
+    for size in (1, 4, 12, 70):
+        generator = random.Random(size)
+        matrix = BooleanMatrix(size, [generator.getrandbits(size) & generator.getrandbits(size)
+                                      for _ in range(size)])
+        matrix.make_transitive()
+        for _ in range(200):
+            row, col = generator.randrange(size), generator.randrange(size)
+            if generator.random() < 0.5:
+                matrix = matrix.make_transitive()  # Edit a transitive matrix, exercising removals from it
+            matrix = matrix.with_cell(row, col, 1 - matrix.get(row, col))
+            assert matrix.make_transitive().rows == warshall_closure(matrix.rows, size)
+
+
+
+def all_matrices(size):
+    for bits in range(1 << size * size):
+        yield BooleanMatrix(size, [bits >> (size * i) & ((1 << size) - 1) for i in range(size)])
+
+
+def brute_force_properties(matrix):
+    n = matrix.size
+    entry = matrix.get
+    pairs = [(i, j) for i in range(n) for j in range(n)]
+    reflexive = all(entry(i, i) for i in range(n))
+    irreflexive = not any(entry(i, i) for i in range(n))
+    symmetric = all(entry(i, j) == entry(j, i) for i, j in pairs)
+    anti_symmetric = all(i == j or not (entry(i, j) and entry(j, i)) for i, j in pairs)
+    transitive = all(entry(i, k) or not (entry(i, j) and entry(j, k)) for i, j in pairs for k in range(n))
+    return {
+        REFLEXIVE: reflexive,
+        IRREFLEXIVE: irreflexive,
+        SYMMETRIC: symmetric,
+        ANTI_SYMMETRIC: anti_symmetric,
+        ASYMMETRIC: all(not (entry(i, j) and entry(j, i)) for i, j in pairs),
+        TRANSITIVE: transitive,
+        EQUIVALENCE: reflexive and symmetric and transitive,
+    }
+
+
+CHECKS = {
+    REFLEXIVE: 'is_reflexive',
+    IRREFLEXIVE: 'is_irreflexive',
+    SYMMETRIC: 'is_symmetric',
+    ANTI_SYMMETRIC: 'is_antisymmetric',
+    ASYMMETRIC: 'is_asymmetric',
+    TRANSITIVE: 'is_transitive',
+    EQUIVALENCE: 'is_equivalence',
+}
+OPERATIONS = {
+    REFLEXIVE: 'make_reflexive',
+    IRREFLEXIVE: 'make_irreflexive',
+    SYMMETRIC: 'make_symmetric',
+    ANTI_SYMMETRIC: 'make_anti_symmetric',
+    ASYMMETRIC: 'make_asymmetric',
+    TRANSITIVE: 'make_transitive',
+    EQUIVALENCE: 'make_equivalent',
+}
+
+
+def test_property_checks_match_brute_force_and_are_cached():
+    for matrix in all_matrices(3):
+        expected = brute_force_properties(matrix)
+        for flag, check in CHECKS.items():
+            fresh = BooleanMatrix(3, matrix.rows)
+            assert getattr(fresh, check)() == expected[flag]
+            assert fresh.checked_properties & flag
+            assert bool(fresh.properties & flag) == expected[flag]
+        fingerprint = BooleanMatrix(3, matrix.rows).fingerprint()
+        assert fingerprint == sum(flag for flag, holds in expected.items() if holds)
+
+
+def test_operations_return_self_when_property_holds_and_establish_it_otherwise():
+    for matrix in all_matrices(3):
+        expected = brute_force_properties(matrix)
+        for flag, operation in OPERATIONS.items():
+            source = BooleanMatrix(3, matrix.rows)
+            result = getattr(source, operation)()
+            if expected[flag]:
+                assert result is source
+            else:
+                assert result is not source and result.rows != source.rows
+            assert brute_force_properties(result)[flag]
+            assert result.has_property(flag)
+            # Bits the operation recorded without checking must agree with the result's actual properties
+            recorded = result.properties & result.checked_properties
+            actual = sum(bit for bit, holds in brute_force_properties(result).items() if holds)
+            assert recorded == actual & result.checked_properties
@@ -0,0 +1,32 @@
+from ZeroOneMatricesTool.cli import main
+
+SUCCESSOR = '010\n001\n000\n'
+
+
+def run(tmp_path, argv, matrices_text):
+    input_path = tmp_path / 'input.txt'
+    output_path = tmp_path / 'output.txt'
+    input_path.write_text(matrices_text)
+    assert main(argv + ['-i', str(input_path), '-o', str(output_path)]) == 0
+    return output_path.read_text().split('\n\n')
+
+
+def test_compose_with_right_matrix(tmp_path):
+    right_path = tmp_path / 'successor.txt'
+    right_path.write_text(SUCCESSOR)
+    outputs = run(tmp_path, ['compose', '--right', str(right_path)], SUCCESSOR + '\n100\n010\n001\n')
+    assert [output.strip() for output in outputs if output.strip()] == ['001\n000\n000', '010\n001\n000']
+
+
+def test_compose_rejects_mismatched_sizes(tmp_path):
+    right_path = tmp_path / 'successor.txt'
+    right_path.write_text(SUCCESSOR)
+    input_path = tmp_path / 'input.txt'
+    input_path.write_text('01\n00\n')
+    assert main(['compose', '--right', str(right_path), '-i', str(input_path)]) == 1
+
+
+def test_power_and_reachable(tmp_path):
+    assert run(tmp_path, ['power', '-k', '2'], SUCCESSOR)[0].strip() == '001\n000\n000'
+    assert run(tmp_path, ['power', '-k', '0'], SUCCESSOR)[0].strip() == '100\n010\n001'
+    assert run(tmp_path, ['reachable', '-k', '2'], SUCCESSOR)[0].strip() == '011\n001\n000'
@@ -0,0 +1,77 @@
+import random
+
+from ZeroOneMatricesTool import closure
+from ZeroOneMatricesTool.closure import condensation_closure, equivalence_classes, find_root, iterate_bits, \
+    strongly_connected_components, warshall_closure
+
+
+def random_rows(size, density, seed):
+    generator = random.Random(seed)
+    return [sum(1 << j for j in range(size) if generator.random() < density) for _ in range(size)]
+
+
+def test_equivalence_classes_match_closure_of_symmetric_reflexive_relation():
+    for size in (0, 1, 5, 40):
+        for seed in range(50):
+            rows = random_rows(size, 2 / max(size, 1), seed)
+            symmetric_rows = [row | 1 << i for i, row in enumerate(rows)]
+            for i, row in enumerate(rows):
+                for j in range(size):
+                    if row >> j & 1:
+                        symmetric_rows[j] |= 1 << i
+            closed_rows = warshall_closure(symmetric_rows, size)
+            expected = sorted({tuple(j for j in range(size) if closed_rows[i] >> j & 1) for i in range(size)})
+            assert sorted(map(tuple, equivalence_classes(rows, size))) == expected
+
+
+def test_equivalence_classes_skip_entries_inside_a_class(monkeypatch):
+    calls = []
+
+    def counting_find_root(parent, element):
+        calls.append(element)
+        return find_root(parent, element)
+
+    monkeypatch.setattr(closure, 'find_root', counting_find_root)
+    rows = random_rows(300, 0.5, 0)  # About 45000 1 entries, nearly all inside the single class
+    assert closure.equivalence_classes(rows, 300) == [list(range(300))]
+    # One find per row, one per merge (at most size - 1) and one per element to collect the classes
+    assert len(calls) <= 3 * 300
+
+
+def test_condensation_closure_reports_progress_through_reachability():
+    rows = [1 << (i + 1) for i in range(199)] + [0]  # A path, so every vertex is its own component
+    reports = []
+    assert condensation_closure(rows, 200, lambda done, total: reports.append((done, total))) == \
+        warshall_closure(rows, 200)
+    assert reports == [(done, 400) for done in range(1, 401)]
+
+
+def test_condensation_closure_can_be_cancelled_during_reachability():
+    class Cancelled(Exception):
+        pass
+
+    def progress(done, total):
+        if done > total * 3 // 4:
+            raise Cancelled
+
+    rows = [1 << (i + 1) for i in range(199)] + [0]
+    try:
+        condensation_closure(rows, 200, progress)
+    except Cancelled:
+        return
+    raise AssertionError('The closure ran to completion')
+
+
+def test_strongly_connected_components_match_mutual_reachability():
+    for size in (0, 1, 6, 30):
+        for seed in range(20):
+            rows = random_rows(size, 1.5 / max(size, 1), seed)
+            components, component_of = strongly_connected_components(lambda vertex: iterate_bits(rows[vertex]), size)
+            closed_rows = warshall_closure(rows, size)
+            for i in range(size):
+                for j in range(size):
+                    mutual = i == j or closed_rows[i] >> j & 1 and closed_rows[j] >> i & 1
+                    assert (component_of[i] == component_of[j]) == bool(mutual)
+                    if closed_rows[i] >> j & 1:  # Reverse topological order: what i reaches is numbered no later
+                        assert component_of[j] <= component_of[i]
+            assert sorted(vertex for component in components for vertex in component) == list(range(size))
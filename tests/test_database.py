@@ -0,0 +1,174 @@
+from datetime import datetime
+
+from sqlalchemy import event, inspect, select, text
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.cache import matrix_memory_size
+from ZeroOneMatricesTool.database import Matrix, MatrixDatabase, MatrixElement, User
+
+LEGACY_MATRICES = {
+    'identity': BooleanMatrix.identity(3),
+    'full': BooleanMatrix(4, [0b1111] * 4),
+    'mixed': BooleanMatrix(9, [(i * 37) % 512 for i in range(9)]),
+}
+
+
+def create_database(matrix_cache_bytes=32 * 1024 * 1024):
+    matrix_database = MatrixDatabase(MatrixDatabase.construct_in_memory_url(), matrix_cache_bytes)
+    matrix_database.ensure_tables_exist()
+    return matrix_database
+
+
+def create_legacy_database():
+    """
+    Creates the schema from before packed storage, with each matrix stored one MatrixElement per cell
+    """
+    matrix_database = MatrixDatabase(MatrixDatabase.construct_in_memory_url())
+    with matrix_database.engine.begin() as connection:
+        User.__table__.create(connection)
+        connection.execute(text('CREATE TABLE matrices (matrix_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL '
+                                'REFERENCES users (user_id), timestamp DATETIME NOT NULL, '
+                                'name VARCHAR(256) NOT NULL)'))
+        MatrixElement.__table__.create(connection)
+        connection.execute(text("INSERT INTO users (user_id, username) VALUES (1, 'alice')"))
+        for matrix_id, (name, matrix) in enumerate(LEGACY_MATRICES.items(), 1):
+            connection.execute(text('INSERT INTO matrices (matrix_id, user_id, timestamp, name) '
+                                    "VALUES (:matrix_id, 1, '2020-01-01 00:00:00', :name)"),
+                               {'matrix_id': matrix_id, 'name': name})
+            connection.execute(MatrixElement.__table__.insert(), [
+                {'matrix_id': matrix_id, 'row': row, 'col': col, 'value': matrix.get(row, col)}
+                for row in range(matrix.size) for col in range(matrix.size)])
+    return matrix_database
+
+
+def test_migrate_matrix_elements_packs_legacy_matrices_once():
+    matrix_database = create_legacy_database()
+    assert matrix_database.migrate_matrix_elements() == len(LEGACY_MATRICES)
+    columns = {column['name'] for column in inspect(matrix_database.engine).get_columns('matrices')}
+    assert {'size', 'packed_elements'} <= columns
+    with matrix_database.engine.connect() as connection:
+        stored = {name: (size, packed_elements) for name, size, packed_elements in connection.execute(
+            select(Matrix.name, Matrix.size, Matrix.packed_elements))}
+        assert connection.scalar(select(MatrixElement.matrix_id).limit(1)) is None
+    assert stored == {name: (matrix.size, matrix.to_bytes()) for name, matrix in LEGACY_MATRICES.items()}
+    assert matrix_database.migrate_matrix_elements() == 0  # Idempotent
+    with matrix_database.engine.connect() as connection:
+        assert {name: (size, packed_elements) for name, size, packed_elements in connection.execute(
+            select(Matrix.name, Matrix.size, Matrix.packed_elements))} == stored
+    matrix_database.matrix_cache.clear()
+    with matrix_database.session_scope() as session:
+        for matrix_id, matrix in enumerate(LEGACY_MATRICES.values(), 1):
+            assert matrix_database.load_matrix(session, matrix_id) == matrix
+
+
+def count_statements(matrix_database):
+    statements = []
+    event.listen(matrix_database.engine, 'before_cursor_execute',
+                 lambda connection, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def save_user_matrices(matrix_database, matrices):
+    with matrix_database.session_scope() as session:
+        user = User(username='alice')
+        session.add(user)
+        session.flush()
+        matrix_ids = [matrix_database.save_matrix(session, user.user_id, f'matrix {number}', matrix,
+                                                  datetime(2024, 1, 1)) for number, matrix in enumerate(matrices)]
+        return user.user_id, matrix_ids
+
+
+def test_second_load_is_served_from_the_cache():
+    matrix_database = create_database()
+    _, (matrix_id,) = save_user_matrices(matrix_database, [BooleanMatrix(5, [3, 5, 7, 11, 13])])
+    statements = count_statements(matrix_database)
+    with matrix_database.session_scope() as session:
+        first = matrix_database.load_matrix(session, matrix_id)
+        queries_after_first_load = len(statements)
+        assert matrix_database.load_matrix(session, matrix_id) is first
+    assert queries_after_first_load == 1
+    assert len(statements) == 1
+    assert matrix_id in matrix_database.matrix_cache
+
+
+def test_cache_evicts_least_recently_used_matrices_past_its_byte_budget():
+    matrices = [BooleanMatrix(64, [(1 << 63) | number] * 64) for number in range(4)]
+    matrix_bytes = matrix_memory_size(matrices[0])
+    matrix_database = create_database(matrix_cache_bytes=2 * matrix_bytes)
+    _, matrix_ids = save_user_matrices(matrix_database, matrices)
+    with matrix_database.session_scope() as session:
+        for matrix_id in matrix_ids[:3]:
+            matrix_database.load_matrix(session, matrix_id)
+        assert list(matrix_database.matrix_cache.entries) == matrix_ids[1:3]
+        assert matrix_database.matrix_cache.size_bytes <= 2 * matrix_bytes
+        matrix_database.load_matrix(session, matrix_ids[1])  # Now most recently used
+        matrix_database.load_matrix(session, matrix_ids[3])
+        assert list(matrix_database.matrix_cache.entries) == [matrix_ids[1], matrix_ids[3]]
+
+
+def test_invalidated_matrix_is_read_again():
+    matrix_database = create_database()
+    _, (matrix_id,) = save_user_matrices(matrix_database, [BooleanMatrix.identity(4)])
+    with matrix_database.session_scope() as session:
+        first = matrix_database.load_matrix(session, matrix_id)
+        matrix_database.matrix_cache.invalidate(matrix_id)
+        assert matrix_id not in matrix_database.matrix_cache
+        statements = count_statements(matrix_database)
+        reloaded = matrix_database.load_matrix(session, matrix_id)
+    assert reloaded == first and reloaded is not first
+    assert len(statements) == 1
+
+
+def save_named_matrices(matrix_database, names_and_timestamps):
+    with matrix_database.session_scope() as session:
+        user = User(username='alice')
+        session.add(user)
+        session.flush()
+        for name, timestamp in names_and_timestamps:
+            matrix_database.save_matrix(session, user.user_id, name, BooleanMatrix(1), timestamp)
+        return user.user_id
+
+
+def all_pages(matrix_database, user_id, search_query, page_size):
+    pages = []
+    after_key = None
+    with matrix_database.session_scope() as session:
+        while True:
+            rows, has_next_page = MatrixDatabase.find_matrices_page(session, user_id, search_query, after_key,
+                                                                    page_size)
+            pages.append([row.name for row in rows])
+            if not has_next_page:
+                return pages
+            after_key = (rows[-1].timestamp, rows[-1].matrix_id)
+
+
+def test_pages_neither_skip_nor_repeat_matrices_with_equal_timestamps():
+    matrix_database = create_database()
+    # Three timestamps shared by several matrices each, so page boundaries fall between equal timestamps
+    names_and_timestamps = [(f'matrix {number}', datetime(2024, 1, 1 + number % 3)) for number in range(11)]
+    user_id = save_named_matrices(matrix_database, names_and_timestamps)
+    for page_size in (1, 2, 3, 4, 10, 11, 12):
+        pages = all_pages(matrix_database, user_id, '', page_size)
+        names = [name for page in pages for name in page]
+        assert sorted(names) == sorted(name for name, _ in names_and_timestamps)
+        assert len(names) == len(set(names))
+        assert all(len(page) == page_size for page in pages[:-1])
+        timestamps = dict(names_and_timestamps)
+        assert [timestamps[name] for name in names] == sorted((timestamps[name] for name in names), reverse=True)
+
+
+def test_search_treats_like_wildcards_literally():
+    matrix_database = create_database()
+    names = ['100% done', '100 done', 'a_b', 'axb', 'back\\slash', 'plain']
+    user_id = save_named_matrices(matrix_database, [(name, datetime(2024, 1, 1)) for name in names])
+
+    def search(query):
+        return sorted(name for page in all_pages(matrix_database, user_id, query, 2) for name in page)
+
+    assert search('%') == ['100% done']
+    assert search('0% d') == ['100% done']
+    assert search('_') == ['a_b']
+    assert search('\\') == ['back\\slash']
+    assert search('A_B') == ['a_b']  # Case insensitive
+    assert search('  ') == sorted(names)
+    assert search('missing') == []
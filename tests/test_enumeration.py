@@ -0,0 +1,32 @@
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.enumeration import count_relations, enumerate_relations, iterate_flags, \
+    parse_property_names
+
+
+def count(size, names, up_to_isomorphism=False, workers=1):
+    return count_relations(size, parse_property_names(names), up_to_isomorphism, workers)
+
+
+def test_counts_match_known_sequences():
+    assert count(4, 'transitive') == 3994  # OEIS A006905
+    assert count(4, 'reflexive,anti_symmetric,transitive') == 219  # Partial orders, A001035
+    assert count(4, 'equivalent') == 15  # Bell numbers, A000110
+    assert count(5, 'reflexive,anti_symmetric,transitive') == 4231
+    assert count(4, 'reflexive,anti_symmetric,transitive', up_to_isomorphism=True) == 16  # A000112
+    assert count(5, 'reflexive,anti_symmetric,transitive', up_to_isomorphism=True) == 63
+    assert count(3, 'reflexive,irreflexive') == 0
+
+
+def test_parallel_count_matches_serial():
+    assert count(5, 'transitive', workers=2) == 154303
+
+
+def test_enumeration_matches_brute_force():
+    size = 3
+    for properties in range(128):
+        expected = []
+        for bits in range(1 << size * size):
+            matrix = BooleanMatrix(size, [bits >> (size * i) & 0b111 for i in range(size)])
+            if all(matrix.has_property(flag) for flag in iterate_flags(properties)):
+                expected.append(tuple(matrix.rows))
+        assert sorted(tuple(matrix.rows) for matrix in enumerate_relations(size, properties)) == sorted(expected)
@@ -0,0 +1,27 @@
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.history import MatrixHistory
+
+
+def test_undo_redo_restores_each_state():
+    history = MatrixHistory()
+    states = [BooleanMatrix(4), BooleanMatrix(4, [1, 2, 4, 8]), BooleanMatrix(4, [15, 2, 4, 8])]
+    history.reset(states[0])
+    for state in states[1:]:
+        history.push(state)
+    assert history.undo() and history.current == states[1]
+    assert history.undo() and history.current == states[0]
+    assert not history.undo()
+    assert history.redo() and history.current == states[1]
+
+
+def test_step_larger_than_cap_is_kept_and_undoable():
+    history = MatrixHistory(max_bytes=1)
+    small = BooleanMatrix(64)
+    history.reset(small)
+    history.push(BooleanMatrix(64, [1] * 64))
+    large = BooleanMatrix(64, [(1 << 64) - 1] * 64)
+    history.push(large)
+    assert len(history) == 2
+    assert history.undo()
+    assert history.current == BooleanMatrix(64, [1] * 64)
+    assert not history.undo()
@@ -0,0 +1,109 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.database import Matrix, MatrixDatabase, MatrixElement, User
+from ZeroOneMatricesTool.library_transfer import export_library, import_library
+
+LEGACY_MATRIX = BooleanMatrix(3, [0b101, 0b010, 0b111])
+
+
+def create_database():
+    matrix_database = MatrixDatabase(MatrixDatabase.construct_in_memory_url())
+    matrix_database.ensure_tables_exist()
+    return matrix_database
+
+
+@pytest.fixture
+def library_database():
+    """
+    A database where alice has packed matrices of several sizes and one matrix stored one MatrixElement per
+    cell, and bob has a matrix of his own
+    """
+    matrix_database = create_database()
+    with matrix_database.session_scope() as session:
+        alice, bob = User(username='alice'), User(username='bob')
+        session.add_all([alice, bob])
+        session.flush()
+        for number in range(25):
+            size = number % 11
+            matrix = BooleanMatrix(size, [(number * 7919 + i * 31) % (1 << size) for i in range(size)])
+            matrix_database.save_matrix(session, alice.user_id, f'matrix {number}', matrix,
+                                        datetime(2024, 1, 1) + timedelta(minutes=number))
+        matrix_database.save_matrix(session, bob.user_id, 'not alice', BooleanMatrix(2), datetime(2024, 1, 1))
+        legacy = Matrix(user_id=alice.user_id, timestamp=datetime(2025, 1, 1), name='legacy')
+        session.add(legacy)
+        session.flush()
+        for row in range(3):
+            for col in range(3):
+                session.add(MatrixElement(matrix_id=legacy.matrix_id, row=row, col=col,
+                                          value=LEGACY_MATRIX.get(row, col)))
+    return matrix_database
+
+
+def export_text(matrix_database, username, batch_size=4):
+    stream = io.StringIO()
+    export_library(matrix_database, username, stream, batch_size)
+    return stream.getvalue()
+
+
+def saved_matrices(matrix_database, username):
+    with matrix_database.session_scope() as session:
+        user_id = session.scalar(select(User.user_id).where(User.username == username))
+        matrix_ids = session.scalars(select(Matrix.matrix_id).where(Matrix.user_id == user_id)).all()
+        return {session.get(Matrix, matrix_id).name: matrix_database.load_matrix(session, matrix_id)
+                for matrix_id in matrix_ids}
+
+
+def test_export_import_round_trip(library_database):
+    library_text = export_text(library_database, 'alice')
+    assert len(library_text.splitlines()) == 1 + 26
+    copy_database = create_database()
+    reports = []
+    transfer = import_library(copy_database, io.StringIO(library_text), batch_size=4, progress=reports.append)
+    assert transfer.matrices == 26 and len(reports) == 7
+    assert saved_matrices(copy_database, 'alice') == saved_matrices(library_database, 'alice')
+    assert saved_matrices(copy_database, 'alice')['legacy'] == LEGACY_MATRIX
+    assert export_text(copy_database, 'alice') == library_text
+
+
+def test_import_skips_existing_names(library_database):
+    library_text = export_text(library_database, 'alice')
+    transfer = import_library(library_database, io.StringIO(library_text), batch_size=4)
+    assert (transfer.matrices, transfer.skipped) == (0, 26)
+    with library_database.session_scope() as session:
+        assert session.scalar(select(func.count()).select_from(Matrix).where(Matrix.name == 'legacy')) == 1
+
+
+def test_import_renames_existing_names(library_database):
+    library_text = export_text(library_database, 'alice')
+    for _ in range(2):
+        transfer = import_library(library_database, io.StringIO(library_text), batch_size=4, on_existing='rename')
+        assert (transfer.matrices, transfer.renamed) == (26, 26)
+    matrices = saved_matrices(library_database, 'alice')
+    assert len(matrices) == 3 * 26
+    assert matrices['legacy (2)'] == matrices['legacy (3)'] == LEGACY_MATRIX
+
+
+def test_import_fails_on_existing_names_leaving_the_batch_out(library_database):
+    copy_database = create_database()
+    library_text = export_text(library_database, 'alice')
+    import_library(copy_database, io.StringIO(library_text))
+    with pytest.raises(ValueError, match='already exists'):
+        import_library(copy_database, io.StringIO(library_text), on_existing='fail')
+    assert len(saved_matrices(copy_database, 'alice')) == 26
+
+
+def test_import_into_another_user(library_database):
+    library_text = export_text(library_database, 'alice')
+    import_library(library_database, io.StringIO(library_text), username='carol')
+    assert saved_matrices(library_database, 'carol') == saved_matrices(library_database, 'alice')
+    assert list(saved_matrices(library_database, 'bob')) == ['not alice']
+
+
+def test_export_of_unknown_user_fails(library_database):
+    with pytest.raises(ValueError, match='no user named'):
+        export_text(library_database, 'nobody')
@@ -0,0 +1,67 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')  # Keep Kivy from parsing pytest's command line
+pytest.importorskip('kivy')
+
+from kivy.uix.scrollview import ScrollView  # noqa: E402
+
+from ZeroOneMatricesTool import matrix_grid  # noqa: E402
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix  # noqa: E402
+from ZeroOneMatricesTool.matrix_grid import MatrixGrid  # noqa: E402
+
+
+class FakeRectangle(object):
+    def __init__(self, texture, size, pos):
+        self.texture = texture
+        self.size = size
+        self.pos = pos
+
+
+@pytest.fixture
+def grid(monkeypatch):
+    """
+    A 50 x 50 grid in a ScrollView showing 10 x 10 cells, drawn with stand-ins for the textures and rectangles
+    that would need an OpenGL context
+    """
+    textures = {text: SimpleNamespace(width=width, height=10, size=(width, 10))
+                for text, width in (('0', 8), ('1', 12))}
+    monkeypatch.setattr(MatrixGrid, 'render_text', lambda self, text: textures[text])
+    monkeypatch.setattr(matrix_grid, 'Rectangle', FakeRectangle)
+    scroll_view = ScrollView(size_hint=(None, None))
+    grid = MatrixGrid()
+    scroll_view.add_widget(grid)
+    grid.set_matrix(BooleanMatrix(50))
+    scroll_view.size = (10 * grid.cell_size, 10 * grid.cell_size)
+    return grid
+
+
+@pytest.mark.parametrize('scroll_y, rows', [(1.0, range(0, 10)), (0.5, range(20, 30)), (0.0, range(40, 50))])
+def test_scrolling_vertically_changes_the_visible_rows(grid, scroll_y, rows):
+    grid.parent.scroll_y = scroll_y
+    assert grid.visible_rows == rows
+    assert grid.visible_cols == range(0, 10)
+    assert set(grid.cell_rectangles) == {(i, j) for i in rows for j in range(0, 10)}
+
+
+def test_scrolling_horizontally_changes_the_visible_columns(grid):
+    grid.parent.scroll_x = 1.0
+    grid.parent.scroll_y = 0.25
+    assert grid.visible_rows == range(30, 40)
+    assert grid.visible_cols == range(40, 50)
+
+
+def test_partly_visible_cells_are_drawn(grid):
+    grid.parent.scroll_y = 0.51
+    assert grid.visible_rows == range(19, 30)
+
+
+def test_changed_cells_are_resized_and_recentred(grid):
+    grid.set_matrix(BooleanMatrix(50).with_cell(3, 4, 1))
+    rectangle = grid.cell_rectangles[3, 4]
+    assert rectangle.texture is grid.value_textures[1]
+    assert rectangle.size == (12, 10)
+    assert rectangle.pos == grid.texture_position(3, 4, grid.value_textures[1])
+    assert rectangle.pos[0] == grid.x + 4 * grid.cell_size + (grid.cell_size - 12) / 2
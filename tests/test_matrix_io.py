@@ -0,0 +1,60 @@
+import io
+import random
+
+import pytest
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.matrix_io import TEXT_READERS, TEXT_WRITERS
+
+
+def random_matrix(size, density, seed):
+    generator = random.Random(seed)
+    return BooleanMatrix(size, [sum(1 << j for j in range(size) if generator.random() < density)
+                                for _ in range(size)])
+
+
+def read_all(format_name, text):
+    return list(TEXT_READERS[format_name](io.StringIO(text)))
+
+
+@pytest.mark.parametrize('format_name', sorted(TEXT_WRITERS))
+def test_round_trip(format_name):
+    matrices = [BooleanMatrix.identity(1), random_matrix(3, 0.5, 0), random_matrix(12, 0.3, 1),
+                random_matrix(12, 0.0, 2), BooleanMatrix.identity(5)]
+    stream = io.StringIO()
+    for matrix in matrices:
+        TEXT_WRITERS[format_name](stream, matrix)
+    assert read_all(format_name, stream.getvalue()) == matrices
+
+
+def test_text_and_csv_put_column_zero_first():
+    expected = [BooleanMatrix(2, [0b01, 0b11])]
+    assert read_all('text', '10\n11\n') == expected
+    assert read_all('csv', '1,0\n1,1\n') == expected
+    assert read_all('edges', '2\n0 0\n1 0\n1,1\n') == expected
+
+
+@pytest.mark.parametrize('format_name, text, message', [
+    ('text', '01\n2 1\n', 'Line 2: rows may only contain 0 and 1'),
+    ('text', '01\n011\n', 'Line 2: expected 2 entries, got 3'),
+    ('text', '011\n101\n\n', 'matrix has 2 rows but 3 columns'),
+    ('text', '011\n101\n', 'matrix has 2 rows but 3 columns'),
+    ('csv', '0,1\n1,x\n', 'Line 2: cells may only be 0 or 1'),
+    ('csv', '0,1\n1,10\n', 'Line 2: cells may only be 0 or 1'),
+    ('csv', '0,1,1\n1,0,0\n', 'Line 1: expected 2 cells, got 3'),
+    ('edges', 'two\n0 1\n', 'Line 1: expected the number of elements'),
+    ('edges', '2\n0\n', 'Line 2: expected a row and a column'),
+    ('edges', '2\n0 1 1\n', 'Line 2: expected a row and a column'),
+    ('edges', '2\n0 2\n', r'Line 2: entry \(0, 2\) is outside a 2 element relation'),
+    ('edges', '2\n-1 0\n', r'Line 2: entry \(-1, 0\) is outside a 2 element relation'),
+])
+def test_malformed_input_is_rejected(format_name, text, message):
+    with pytest.raises(ValueError, match=message):
+        read_all(format_name, text)
+
+
+def test_matrices_before_an_error_are_still_yielded():
+    matrices = TEXT_READERS['text'](io.StringIO('1\n\n012\n'))
+    assert next(matrices) == BooleanMatrix.identity(1)
+    with pytest.raises(ValueError):
+        next(matrices)
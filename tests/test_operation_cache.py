@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from ZeroOneMatricesTool import operation_cache
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.database import MatrixDatabase
+from ZeroOneMatricesTool.operation_cache import OperationCache, matrix_digest
+
+
+def random_matrix(size, density, seed):
+    generator = random.Random(seed)
+    return BooleanMatrix(size, [sum(1 << j for j in range(size) if generator.random() < density)
+                                for _ in range(size)])
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    """
+    Records every matrix the equivalent operation is actually computed for
+    """
+    matrices = []
+    operation = operation_cache.OPERATIONS['equivalent']
+
+    def counting_operation(matrix):
+        matrices.append(matrix)
+        return operation(matrix)
+
+    monkeypatch.setitem(operation_cache.OPERATIONS, 'equivalent', counting_operation)
+    return matrices
+
+
+def test_digest_depends_only_on_content():
+    matrix = random_matrix(20, 0.3, 0)
+    assert matrix_digest(BooleanMatrix(20, list(matrix.rows))) == matrix_digest(matrix)
+    assert matrix_digest(matrix.with_cell(0, 0, 1 - matrix.get(0, 0))) != matrix_digest(matrix)
+    assert matrix_digest(BooleanMatrix(8)) != matrix_digest(BooleanMatrix(7))
+
+
+def test_repeated_operation_is_served_from_memory(computed):
+    cache = OperationCache()
+    matrix = random_matrix(20, 0.1, 0)
+    result = cache.apply(matrix, 'equivalent')
+    assert cache.apply(matrix, 'equivalent') is result
+    assert computed == [matrix]
+    assert result == matrix.make_equivalent()
+
+
+def test_equal_matrices_share_a_result(computed):
+    cache = OperationCache()
+    matrix = random_matrix(20, 0.1, 1)
+    result = cache.apply(matrix, 'equivalent')
+    assert cache.apply(BooleanMatrix(20, list(matrix.rows)), 'equivalent') is result
+    assert len(computed) == 1
+    cache.apply(matrix.with_cell(0, 1, 1 - matrix.get(0, 1)), 'equivalent')
+    assert len(computed) == 2
+
+
+def test_unchanged_matrix_is_returned_itself(computed):
+    matrix = BooleanMatrix.identity(5)
+    assert OperationCache().apply(matrix, 'equivalent') is matrix
+
+
+def test_results_persist_between_caches(computed):
+    matrix_database = MatrixDatabase(MatrixDatabase.construct_in_memory_url())
+    matrix_database.ensure_tables_exist()
+    matrix = random_matrix(30, 0.05, 2)
+    result = OperationCache(matrix_database=matrix_database).apply(matrix, 'equivalent')
+    fresh_cache = OperationCache(matrix_database=matrix_database)
+    assert fresh_cache.apply(BooleanMatrix(30, list(matrix.rows)), 'equivalent') == result
+    assert computed == [matrix]
+    assert (matrix_digest(matrix), 'equivalent') in fresh_cache.results
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.operations import apply_operations
+from ZeroOneMatricesTool.parallel import pack_chunk, run_parallel, unpack_chunk
+
+OPERATION_NAMES = ['symmetric', 'transitive']
+
+
+def random_matrices(count, seed=0):
+    generator = random.Random(seed)
+    matrices = []
+    for _ in range(count):
+        size = generator.randrange(0, 20)
+        matrices.append(BooleanMatrix(size, [generator.getrandbits(size) & generator.getrandbits(size)
+                                             for _ in range(size)]))
+    return matrices
+
+
+def test_pack_chunk_round_trip():
+    matrices = random_matrices(10)
+    assert unpack_chunk(*pack_chunk(matrices)) == matrices
+
+
+def test_ordered_results_match_serial_application():
+    matrices = random_matrices(23)
+    expected = [apply_operations(matrix, OPERATION_NAMES) for matrix in matrices]
+    assert list(run_parallel(iter(matrices), OPERATION_NAMES, workers=2, chunk_size=3)) == expected
+
+
+def test_unordered_results_carry_their_input_index():
+    matrices = random_matrices(23, seed=1)
+    expected = [apply_operations(matrix, OPERATION_NAMES) for matrix in matrices]
+    results = list(run_parallel(matrices, OPERATION_NAMES, workers=2, chunk_size=3, ordered=False))
+    assert sorted(index for index, _ in results) == list(range(len(matrices)))
+    assert [matrix for _, matrix in sorted(results, key=lambda result: result[0])] == expected
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_worker_errors_reach_the_caller(ordered):
+    with pytest.raises(KeyError):
+        list(run_parallel(random_matrices(5), ['no_such_operation'], workers=2, chunk_size=2, ordered=ordered))
@@ -0,0 +1,47 @@
+import random
+from itertools import product
+
+from ZeroOneMatricesTool.boolean_matrix import BooleanMatrix
+from ZeroOneMatricesTool.operations import OPERATIONS
+from ZeroOneMatricesTool.pipeline import run_pipeline
+
+
+def apply_one_by_one(matrix, operation_names):
+    for name in operation_names:
+        matrix = OPERATIONS[name](matrix)
+    return matrix
+
+
+def check_chain(rows, size, operation_names):
+    expected = apply_one_by_one(BooleanMatrix(size, rows), operation_names)
+    result = run_pipeline(BooleanMatrix(size, rows), operation_names)
+    assert result.rows == expected.rows, operation_names
+    # Properties recorded by the planned steps must agree with fresh checks
+    fresh = BooleanMatrix(size, result.rows).fingerprint()
+    assert result.properties & result.checked_properties == fresh & result.checked_properties, operation_names
+
+
+def test_planned_chains_match_one_by_one_application_exhaustively():
+    size = 3
+    matrices = [[bits >> (size * i) & 0b111 for i in range(size)] for bits in range(1 << 9)]
+    # Chains of three and four operations start from the first and last matrix with each fingerprint rather than
+    # from all 512, so that every combination of properties is still covered at a fraction of the cost
+    by_fingerprint = {}
+    for rows in matrices:
+        by_fingerprint.setdefault(BooleanMatrix(size, rows).fingerprint(), []).append(rows)
+    representatives = []
+    for group in by_fingerprint.values():
+        representatives.extend(group[:1] if len(group) == 1 else [group[0], group[-1]])
+    for length in range(1, 5):
+        for operation_names in product(OPERATIONS, repeat=length):
+            for rows in matrices if length <= 2 else representatives:
+                check_chain(rows, size, operation_names)
+
+
+def test_planned_chains_match_one_by_one_application_at_random():
+    generator = random.Random(0)
+    for _ in range(3000):
+        size = generator.randrange(1, 9)
+        rows = [generator.getrandbits(size) & generator.getrandbits(size) for _ in range(size)]
+        operation_names = [generator.choice(list(OPERATIONS)) for _ in range(generator.randrange(1, 7))]
+        check_chain(rows, size, operation_names)
@@ -0,0 +1,91 @@
+import random
+import struct
+
+import pytest
+
+from ZeroOneMatricesTool.boolean_matrix import ALL_PROPERTIES, BooleanMatrix
+from ZeroOneMatricesTool.relation_file import EDGES_ENCODING, FILE_HEADER, PACKED_ENCODING, RECORD_HEADER, \
+    RelationFileReader, RelationRecord, decode_matrix, encode_matrix, write_relation_file
+
+
+def random_matrix(size, density, seed):
+    generator = random.Random(seed)
+    return BooleanMatrix(size, [sum(1 << j for j in range(size) if generator.random() < density)
+                                for _ in range(size)])
+
+
+def encoding_of(matrix):
+    header, _ = encode_matrix(matrix)
+    return RECORD_HEADER.unpack(header)[3]
+
+
+def test_sparse_matrices_use_edges_and_dense_ones_packed():
+    assert encoding_of(random_matrix(100, 0.001, 0)) == EDGES_ENCODING
+    assert encoding_of(random_matrix(100, 0.5, 0)) == PACKED_ENCODING
+
+
+def test_round_trip_in_both_encodings(tmp_path):
+    matrices = [BooleanMatrix(0), BooleanMatrix.identity(1), random_matrix(9, 0.5, 1), random_matrix(70, 0.01, 2),
+                random_matrix(70, 0.6, 3), BooleanMatrix(200)]
+    assert {encoding_of(matrix) for matrix in matrices} == {PACKED_ENCODING, EDGES_ENCODING}
+    path = tmp_path / 'matrices.zomf'
+    assert write_relation_file(path, matrices) == len(matrices)
+    with RelationFileReader(path) as reader:
+        records = list(reader.records())
+        assert [record.size for record in records] == [matrix.size for matrix in matrices]
+        assert [record.ones for record in records] == [matrix.count_ones() for matrix in matrices]
+        assert list(reader) == matrices
+
+
+def test_read_matrices_carry_the_stored_fingerprint(tmp_path):
+    matrices = [random_matrix(8, 0.4, seed) for seed in range(20)] + [BooleanMatrix.identity(8)]
+    path = tmp_path / 'matrices.zomf'
+    write_relation_file(path, matrices)
+    with RelationFileReader(path) as reader:
+        for record, matrix in zip(reader.records(), matrices):
+            read_matrix = reader.read(record)
+            assert record.fingerprint == matrix.fingerprint()
+            assert read_matrix.checked_properties == ALL_PROPERTIES
+            assert read_matrix.properties == matrix.fingerprint()
+
+
+@pytest.mark.parametrize('contents', [b'', b'ZOM', b'XXXX\x01\x00\x00\x00', b'ZOMF\x02\x00\x00\x00'])
+def test_files_without_a_valid_header_are_rejected(tmp_path, contents):
+    path = tmp_path / 'bad.zomf'
+    path.write_bytes(contents)
+    with pytest.raises(ValueError):
+        RelationFileReader(path)
+
+
+@pytest.mark.parametrize('cut', [1, RECORD_HEADER.size - 1, RECORD_HEADER.size + 1])
+def test_truncated_files_are_rejected(tmp_path, cut):
+    path = tmp_path / 'matrices.zomf'
+    write_relation_file(path, [random_matrix(20, 0.5, 0), random_matrix(20, 0.5, 1)])
+    contents = path.read_bytes()
+    path.write_bytes(contents[:len(contents) - 20 * 3 - RECORD_HEADER.size + cut])
+    with RelationFileReader(path) as reader:
+        with pytest.raises(ValueError, match='Truncated'):
+            list(reader)
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError, match='Unknown matrix encoding'):
+        decode_matrix(RelationRecord(2, 0, 0, 7, FILE_HEADER.size, 0), b'')
+
+
+def test_packed_payload_of_the_wrong_length_is_rejected():
+    with pytest.raises(ValueError, match='does not match'):
+        decode_matrix(RelationRecord(9, 0, 0, PACKED_ENCODING, FILE_HEADER.size, 17), bytes(17))
+
+
+@pytest.mark.parametrize('edges', [(0, 5), (5, 0), (4, 65535)])
+def test_edge_indices_outside_the_relation_are_rejected(edges):
+    payload = struct.pack(f'<{len(edges)}H', *edges)
+    with pytest.raises(ValueError, match='outside a 5 element relation'):
+        decode_matrix(RelationRecord(5, 1, 0, EDGES_ENCODING, FILE_HEADER.size, len(payload)), payload)
+
+
+def test_edge_payload_with_a_partial_entry_is_rejected():
+    payload = struct.pack('<3H', 0, 1, 2)
+    with pytest.raises(ValueError, match='whole number of entries'):
+        decode_matrix(RelationRecord(5, 1, 0, EDGES_ENCODING, FILE_HEADER.size, len(payload)), payload)
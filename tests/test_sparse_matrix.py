@@ -0,0 +1,32 @@
+import random
+import tracemalloc
+
+from ZeroOneMatricesTool.sparse_matrix import SparseBooleanMatrix, to_dense
+
+
+def random_sparse_matrix(size, ones, seed):
+    generator = random.Random(seed)
+    return SparseBooleanMatrix.from_edges(size, [(generator.randrange(size), generator.randrange(size))
+                                                 for _ in range(ones)])
+
+
+def test_transitive_closure_matches_dense():
+    for size, ones in ((5, 7), (70, 105), (1100, 330), (1100, 1100), (1500, 450), (1500, 4500)):
+        for seed in range(3):
+            matrix = random_sparse_matrix(size, ones, seed)
+            assert to_dense(matrix.make_transitive()) == matrix.to_matrix().make_transitive()
+
+
+def test_transitive_closure_of_large_sparse_relation_stays_sparse():
+    size = 20000
+    half = size // 2
+    matrix = SparseBooleanMatrix.from_edges(size, [(i, i + half) for i in range(half)])
+    tracemalloc.start()
+    try:
+        closed = matrix.make_transitive()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert isinstance(closed, SparseBooleanMatrix)
+    assert closed == matrix
+    assert peak_bytes < 20 * 1024 * 1024  # A dense closure needs size ** 2 / 8 = 50 MB of rows alone